@@ -0,0 +1,157 @@
+# batch_leases.py — Lease-based sharding of campaign batches across workers
+#
+# Any number of `worker.py --shard` processes, on one host or several
+# sharing the logs/ and campaigns/ directories, claim one batch at a time.
+# A claim is a lease with an expiry; the holder renews it while sending and
+# drops it when done. A crashed worker stops renewing, its lease runs out
+# and the batch goes to the next claimant, which resumes from the cursor,
+# spool and ledger (already-sent addresses are skipped as duplicates).
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from campaign_utils import get_next_batch
+from file_lock import locked
+
+LEASE_DIR = "logs/leases"
+LEASE_PATH = os.path.join(LEASE_DIR, "leases.json")
+os.makedirs(LEASE_DIR, exist_ok=True)
+
+LEASE_TTL = float(os.environ.get("LEASE_TTL", 120))   # seconds without a heartbeat before reclaim
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class BatchLeases:
+    # One small JSON file, rewritten under a lock:
+    #   {"leases": {"<campaign>/<batch>": {"owner", "expires", "claimed"}},
+    #    "served": {"<campaign>": <last claim time>}}
+    # Claims are fair across campaigns: the campaign with the fewest live
+    # leases goes first, ties broken by whichever was served longest ago,
+    # so one huge campaign can't hold every worker while others wait.
+
+    def __init__(self, path=LEASE_PATH, ttl=LEASE_TTL, owner=None):
+        self.path = path
+        self.ttl = ttl
+        self.owner = owner or worker_id()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"leases": {}, "served": {}}
+
+    def _save(self, state):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def _expire(self, state, now):
+        for key, lease in list(state["leases"].items()):
+            if lease["expires"] <= now:
+                logging.warning(f"♻️ Lease on {key} held by {lease['owner']} expired; batch is up for reclaim.")
+                del state["leases"][key]
+
+    # --- Claiming ---
+    def claim(self, campaigns):
+        # Returns (campaign, batch number, unsent rows) leased to this
+        # worker, or None when no campaign has an unleased batch left.
+        # Finding a batch reads campaign files, so it happens outside the
+        # lock; only checking and recording the lease happen under it. A
+        # batch another worker leased in between is skipped and the search
+        # goes on past it.
+        with locked(self.path):
+            state = self._load()
+        now = time.time()
+        held = {}
+        for key, lease in state["leases"].items():
+            if lease["expires"] > now:
+                campaign, batch = key.rsplit("/", 1)
+                held.setdefault(campaign, set()).add(int(batch))
+        order = sorted(campaigns, key=lambda c: (len(held.get(c, ())), state["served"].get(c, 0)))
+        for campaign in order:
+            skip = held.get(campaign, set())
+            while True:
+                batch_num, batch_df = get_next_batch(None, campaign, skip=skip)
+                if batch_num is None:
+                    break
+                key = f"{campaign}/{batch_num}"
+                with locked(self.path):
+                    state = self._load()
+                    now = time.time()
+                    self._expire(state, now)
+                    if key not in state["leases"]:
+                        state["leases"][key] = {"owner": self.owner, "expires": now + self.ttl, "claimed": now}
+                        state["served"][campaign] = now
+                        self._save(state)
+                        return campaign, batch_num, batch_df
+                skip.add(batch_num)
+        return None
+
+    def renew(self, campaign, batch_num):
+        # False if the lease was lost (expired and possibly reclaimed)
+        key = f"{campaign}/{batch_num}"
+        with locked(self.path):
+            state = self._load()
+            lease = state["leases"].get(key)
+            if lease is None or lease["owner"] != self.owner:
+                return False
+            lease["expires"] = time.time() + self.ttl
+            self._save(state)
+            return True
+
+    def release(self, campaign, batch_num):
+        key = f"{campaign}/{batch_num}"
+        with locked(self.path):
+            state = self._load()
+            lease = state["leases"].get(key)
+            if lease is not None and lease["owner"] == self.owner:
+                del state["leases"][key]
+                self._save(state)
+
+    def hold(self, campaign, batch_num, on_lost):
+        # Context manager renewing the lease every ttl/4 from a thread;
+        # calls on_lost() once if a renewal fails, releases on exit
+        return _Held(self, campaign, batch_num, on_lost)
+
+
+class _Held:
+    def __init__(self, leases, campaign, batch_num, on_lost):
+        self.leases = leases
+        self.campaign = campaign
+        self.batch_num = batch_num
+        self.on_lost = on_lost
+        self.lost = False
+        self._done = threading.Event()
+
+    def _beat(self):
+        while not self._done.wait(self.leases.ttl / 4):
+            try:
+                renewed = self.leases.renew(self.campaign, self.batch_num)
+            except Exception:
+                # Can't tell whether the lease is still ours: assume it isn't
+                logging.exception(f"Renewing the lease on {self.campaign}/{self.batch_num} failed")
+                renewed = False
+            if not renewed:
+                self.lost = True
+                logging.error(f"Lost the lease on {self.campaign}/{self.batch_num}; stopping this batch.")
+                self.on_lost()
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        if not self.lost:
+            self.leases.release(self.campaign, self.batch_num)
@@ -0,0 +1,56 @@
+# benchmarks/bench_extract.py — Email extraction throughput on the bundled playlist CSV
+#
+#   python benchmarks/bench_extract.py [--scale 100] [--repeat 3]
+
+import os
+import re
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_extract
+from playlist_snapshot import CSV_FILE
+
+# The per-row pattern the scraper used before email_extract
+LEGACY_PATTERN = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
+
+
+def legacy_rows(texts):
+    emails = set()
+    for text in texts:
+        emails.update(re.findall(LEGACY_PATTERN, text))
+    return list(emails)
+
+
+def bench(label, fn, megabytes, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {best * 1000:8.1f} ms  {megabytes / best:8.1f} MB/s  {len(found):>7} emails")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.csv, dtype=str)
+    df = pd.concat([base] * args.scale, ignore_index=True)
+    texts = df.fillna("").astype(str).agg(" ".join, axis=1).tolist()
+    megabytes = sum(len(t) for t in texts) / 1e6
+    print(f"{len(df):,} rows x {len(df.columns)} columns, {megabytes:.1f} MB of text (scale {args.scale}x)\n")
+
+    bench("legacy re.findall per row", lambda: legacy_rows(texts), megabytes, args.repeat)
+    bench("extract_emails (rows)", lambda: email_extract.extract_emails(texts), megabytes, args.repeat)
+    bench("frame_emails (columns)", lambda: email_extract.frame_emails(df), megabytes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_importtime.py — Dashboard cold start and per-page rerun cost
+#
+#   python benchmarks/bench_importtime.py [--pages Home,Send] [--reruns 5] [--top 8]
+#
+# Each page runs in a fresh interpreter under `-X importtime`, driven by
+# streamlit's AppTest: a first run of the dashboard (cold start, Home), a
+# switch to the page (first visit, imports its modules), then plain reruns.
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASE_MARK = "#bench-phase "
+DEFAULT_PAGES = ["Home", "Contacts", "Preview", "Send", "Tracker", "Unlock"]
+
+
+def child(page, reruns):
+    # Runs inside the measured interpreter; timings go to stdout, phase
+    # markers to stderr so the importtime lines can be split per phase
+    from streamlit.testing.v1 import AppTest
+
+    def phase(name):
+        sys.stderr.write(f"{PHASE_MARK}{name}\n")
+        sys.stderr.flush()
+
+    phase("startup")
+    start = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, "email_dashboard.py"), default_timeout=60)
+    at.session_state["user_email"] = "bench@example.com"
+    at.run()
+    print(f"cold {time.perf_counter() - start:.4f}")
+
+    phase("first-visit")
+    radio = at.sidebar.radio[0]
+    label = next(o for o in radio.options if page.lower() in o.lower())
+    start = time.perf_counter()
+    radio.set_value(label).run()
+    print(f"visit {time.perf_counter() - start:.4f}")
+    if at.exception:
+        print(f"error {at.exception[0].message}")
+
+    phase("rerun")
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+    print(f"rerun {sorted(times)[len(times) // 2]:.4f}")
+
+
+def parse_importtime(stderr):
+    # {phase: [(cumulative µs, module)]} for top-level imports only
+    phases, current = {}, "startup"
+    for line in stderr.splitlines():
+        if line.startswith(PHASE_MARK):
+            current = line[len(PHASE_MARK):]
+            continue
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):  # nested import, already counted by its parent
+            continue
+        phases.setdefault(current, []).append((int(cumulative), name.strip()))
+    return phases
+
+
+def measure(page, reruns):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", page, "--reruns", str(reruns)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    timings = dict(line.split(" ", 1) for line in proc.stdout.splitlines() if " " in line)
+    return timings, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default=",".join(DEFAULT_PAGES))
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--child")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.reruns)
+        return
+
+    print(f"{'page':<10} {'cold start':>11} {'first visit':>12} {'rerun p50':>10} {'visit imports':>14}")
+    heaviest = {}
+    for page in args.pages.split(","):
+        timings, phases = measure(page, args.reruns)
+        if "visit" not in timings:
+            print(f"{page:<10} failed to run")
+            continue
+        visit_imports = phases.get("first-visit", [])
+        print(
+            f"{page:<10} {float(timings['cold']) * 1000:9.0f}ms {float(timings['visit']) * 1000:10.0f}ms "
+            f"{float(timings['rerun']) * 1000:8.1f}ms {sum(c for c, _ in visit_imports) / 1000:12.0f}ms"
+        )
+        if "error" in timings:
+            print(f"{'':<10} ! {timings['error']}")
+        for cumulative, name in visit_imports:
+            heaviest[name] = max(heaviest.get(name, 0), cumulative)
+
+    print("\nHeaviest modules imported on a first page visit:")
+    for name, cumulative in sorted(heaviest.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:<40} {cumulative / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
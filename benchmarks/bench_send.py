@@ -0,0 +1,302 @@
+# benchmarks/bench_send.py — End-to-end send throughput against a local Gmail stand-in
+#
+#   python benchmarks/bench_send.py [--scenarios worker,send_email,fetch_replies,google_search]
+#                                   [--rows 1000,10000] [--latency-ms 20] [--error-rate 0.01]
+#                                   [--throttle-rate 0.01] [--workers 8]
+#                                   [--save-baseline] [--tolerance 0.25]
+#
+# Every scenario runs in a fresh interpreter inside a scratch directory (the
+# app keeps its state under ./logs and ./campaigns), talking to
+# fake_google.py in a separate process. Reported: messages/sec, p50/p99
+# latency, CPU seconds and peak RSS of the client process.
+#
+# Results are compared with benchmarks/baselines.json for the same scenario,
+# size and server knobs; a drop in throughput or a rise in p99 or RSS
+# beyond --tolerance exits non-zero. --save-baseline records the current
+# run instead. Baselines are machine-specific: re-record them on the box
+# the comparison runs on.
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines.json")
+SCENARIOS = ["worker", "send_email", "fetch_replies", "google_search"]
+KNOBS = ("latency_ms", "jitter_ms", "error_rate", "throttle_rate", "quota_per_second")
+
+# send_email is sequential; past this many calls it only measures the same thing for longer
+SEND_EMAIL_MAX_CALLS = 5000
+
+
+# --- Measurement helpers (child process) ---
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def histogram_quantile(child, q):
+    # Linear interpolation inside the bucket, as Prometheus does
+    with child._lock:
+        counts, total = list(child.counts), child.count
+    if not total:
+        return None
+    rank, seen, lower = q * total, 0, 0.0
+    for bound, n in zip(child.bounds + (child.bounds[-1],), counts):
+        if n and seen + n >= rank:
+            return lower + (bound - lower) * (rank - seen) / n
+        seen += n
+        lower = bound
+    return child.bounds[-1]
+
+
+def fake_creds():
+    # A token with no expiry never triggers a refresh against Google
+    from google.oauth2.credentials import Credentials
+    return Credentials(token="bench")
+
+
+def run_worker(rows, **_):
+    import pandas as pd
+    import worker
+    from campaign_utils import save_campaign_data
+    from connect_gmail import SEND_SECONDS
+    from gmail_client import GmailClient
+    from send_engine import SendEngine
+
+    save_campaign_data("bench", pd.DataFrame({
+        "email": [f"user{i}@example.com" for i in range(rows)],
+        "name": [f"User {i}" for i in range(rows)],
+    }))
+    client = GmailClient(fake_creds())
+    engine = SendEngine(client, max_workers=worker.SEND_WORKERS,
+                        per_second=worker.SEND_PER_SECOND, per_day=worker.SEND_PER_DAY)
+
+    def measured():
+        sent = 0
+        while True:
+            report = worker.send_next_batch(engine, "bench")
+            if report is None or report["quota_exhausted"]:
+                break
+            sent += report["sent"]
+            if not report["sent"]:
+                break  # only failed rows left in this batch
+        return sent
+
+    sent, stats = measure(measured)
+    latency = SEND_SECONDS.labels("engine")
+    stats.update(messages=sent, p50=histogram_quantile(latency, 0.5), p99=histogram_quantile(latency, 0.99))
+    return stats
+
+
+def run_send_email(rows, **_):
+    from connect_gmail import send_email
+    from gmail_client import GmailClient
+
+    client = GmailClient(fake_creds())
+    calls = min(rows, SEND_EMAIL_MAX_CALLS)
+    latencies = []
+
+    def measured():
+        sent = 0
+        for i in range(calls):
+            start = time.perf_counter()
+            result = send_email(client, f"user{i}@example.com", "Hello {name}", "Hi there", campaign="bench")
+            latencies.append(time.perf_counter() - start)
+            sent += result.get("status") == "success"
+        return sent
+
+    sent, stats = measure(measured)
+    stats.update(messages=sent, p50=percentile(latencies, 0.5), p99=percentile(latencies, 0.99))
+    return stats
+
+
+def run_fetch_replies(rows, polls=50, **_):
+    # The fake inbox starts with `rows` messages; between polls a few sends
+    # each produce a reply (server started with --reply-rate 1)
+    from connect_gmail import fetch_replies
+    from gmail_client import GmailClient
+
+    client = GmailClient(fake_creds())
+    per_poll = max(1, rows // polls // 10)
+    latencies = []
+
+    def measured():
+        fetched = 0
+        for _ in range(polls):
+            for _ in range(per_poll):
+                client.send_raw("eA==")
+            start = time.perf_counter()
+            fetch_replies(client)
+            latencies.append(time.perf_counter() - start)
+            fetched += per_poll
+        return fetched
+
+    start = time.perf_counter()
+    fetch_replies(client)  # first poll: full sync
+    cold = time.perf_counter() - start
+    fetched, stats = measure(measured)
+    stats.update(messages=fetched, p50=percentile(latencies, 0.5), p99=percentile(latencies, 0.99), cold=cold)
+    return stats
+
+
+def run_google_search(rows, **_):
+    # Enough queries (3 pages of 10 results each) to surface ~`rows` results
+    import scraper_module
+
+    queries = [f"indie playlist {i}" for i in range(max(1, rows // 30))]
+    latencies = []
+
+    def measured():
+        found = 0
+        for query in queries:
+            start = time.perf_counter()
+            found += len(scraper_module.google_search(query, "bench-key", "bench-cx"))
+            latencies.append(time.perf_counter() - start)
+        return found
+
+    found, stats = measure(measured)
+    stats.update(messages=found, p50=percentile(latencies, 0.5), p99=percentile(latencies, 0.99))
+    return stats
+
+
+def measure(fn):
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return result, {"elapsed": elapsed, "cpu": cpu}
+
+
+def child(scenario, rows):
+    import logging
+    logging.disable(logging.INFO)
+    stats = globals()[f"run_{scenario}"](rows)
+    stats["msgs_per_sec"] = stats["messages"] / stats["elapsed"] if stats["elapsed"] else 0.0
+    stats["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(stats))
+
+
+# --- Driver (parent process) ---
+def run_scenario(scenario, rows, knobs, workers):
+    sys.path.insert(0, BENCH_DIR)
+    from fake_google import spawn, fetch_stats
+
+    server_knobs = dict(knobs)
+    if scenario == "fetch_replies":
+        server_knobs.update(inbox=rows, reply_rate=1.0)
+    with spawn(**server_knobs) as url, tempfile.TemporaryDirectory(prefix="bench-send-") as scratch:
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+            GMAIL_API_ENDPOINT=url,
+            CSE_ENDPOINT=f"{url}/customsearch/v1",
+            CSE_QPS="100000",
+            SEND_WORKERS=str(workers),
+            SEND_PER_SECOND="100000",
+            SEND_PER_DAY="0",  # no daily cap
+        )
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", scenario, "--rows", str(rows)],
+            cwd=scratch, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{scenario} ({rows} rows) failed:\n{proc.stderr[-2000:]}")
+        stats = json.loads(proc.stdout.strip().splitlines()[-1])
+        stats["server"] = fetch_stats(url)
+    return stats
+
+
+def baseline_key(scenario, rows, knobs, workers):
+    knob_text = ",".join(f"{k}={knobs[k]}" for k in KNOBS)
+    return f"{scenario}/{rows}/workers={workers}/{knob_text}"
+
+
+def compare(stats, baseline, tolerance):
+    # Human-readable regressions, empty if none
+    problems = []
+    if stats["msgs_per_sec"] < baseline["msgs_per_sec"] * (1 - tolerance):
+        problems.append(f"throughput {stats['msgs_per_sec']:.1f}/s vs baseline {baseline['msgs_per_sec']:.1f}/s")
+    # Sub-millisecond p99 moves are noise
+    if stats["p99"] is not None and baseline.get("p99") is not None \
+            and stats["p99"] > max(baseline["p99"] * (1 + tolerance), baseline["p99"] + 0.001):
+        problems.append(f"p99 {stats['p99'] * 1000:.1f}ms vs baseline {baseline['p99'] * 1000:.1f}ms")
+    if stats["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        problems.append(f"peak RSS {stats['peak_rss_mb']:.0f}MB vs baseline {baseline['peak_rss_mb']:.0f}MB")
+    return problems
+
+
+def fmt_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--rows", default="1000,10000")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--quota-per-second", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, int(args.rows))
+        return
+
+    knobs = {k: getattr(args, k) for k in KNOBS}
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    print(f"server: {', '.join(f'{k}={v}' for k, v in knobs.items())}; {args.workers} send workers\n")
+    print(f"{'scenario':<14} {'rows':>8} {'msgs':>8} {'msgs/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'cpu s':>7} {'rss MB':>7}  vs baseline")
+    regressions = []
+    for scenario in args.scenarios.split(","):
+        for rows in map(int, args.rows.split(",")):
+            stats = run_scenario(scenario, rows, knobs, args.workers)
+            key = baseline_key(scenario, rows, knobs, args.workers)
+            baseline = baselines.get(key)
+            if args.save_baseline:
+                verdict = "saved"
+                baselines[key] = {k: stats[k] for k in ("msgs_per_sec", "p50", "p99", "cpu", "peak_rss_mb")}
+            elif baseline is None:
+                verdict = "no baseline"
+            else:
+                problems = compare(stats, baseline, args.tolerance)
+                verdict = "ok" if not problems else "REGRESSION: " + "; ".join(problems)
+                if problems:
+                    regressions.append(f"{key}: {'; '.join(problems)}")
+            print(f"{scenario:<14} {rows:>8} {stats['messages']:>8} {stats['msgs_per_sec']:>9.1f} "
+                  f"{fmt_ms(stats['p50']):>8} {fmt_ms(stats['p99']):>8} {stats['cpu']:>7.2f} "
+                  f"{stats['peak_rss_mb']:>7.0f}  {verdict}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaselines written to {args.baseline}")
+    if regressions:
+        print("\n❌ Performance regressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# benchmarks/fake_google.py — Local stand-in for the Gmail and Custom Search APIs
+#
+#   python benchmarks/fake_google.py [--port 8090] [--latency-ms 20] [--error-rate 0.01]
+#                                   [--throttle-rate 0.02] [--quota-per-second 100]
+#
+# Serves the Gmail v1 calls GmailClient and InboxSync make (messages.send,
+# getProfile, messages.list/get, history.list and batch requests) plus the
+# Custom Search JSON API. Point the app at it with
+#   GMAIL_API_ENDPOINT=http://127.0.0.1:8090  CSE_ENDPOINT=http://127.0.0.1:8090/customsearch/v1
+# Knobs: fixed + jittered latency, random 500s, random 429s and a
+# server-side per-second quota answered with 429 + Retry-After.
+
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import subprocess
+import urllib.parse
+from email.parser import BytesParser
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGoogle:
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, throttle_rate=0.0,
+                 quota_per_second=0, inbox=0, reply_rate=0.0, seed=0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.quota_per_second = quota_per_second
+        self.reply_rate = reply_rate
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.window, self.window_calls = 0, 0
+        self.counts = {"requests": 0, "sent": 0, "errors": 0, "throttled": 0}
+        self.messages = {}   # id -> metadata
+        self.history = []    # (history id, message id), ascending
+        self.history_id = 1000
+        for i in range(inbox):
+            self._receive(f"contact{i}@example.com", f"Reply {i}")
+
+    # --- Mailbox ---
+    def _receive(self, sender, subject):
+        # Caller holds the lock (or is __init__)
+        self.history_id += 1
+        msg_id = f"{self.history_id:x}"
+        self.messages[msg_id] = {
+            "id": msg_id,
+            "threadId": msg_id,
+            "snippet": f"Thanks for reaching out ({subject})",
+            "internalDate": str(int(time.time() * 1000)),
+            "payload": {"headers": [{"name": "From", "value": sender}, {"name": "Subject", "value": subject}]},
+        }
+        self.history.append((self.history_id, msg_id))
+
+    # --- Failure injection ---
+    def fault(self):
+        # Returns (status, headers) to fail this call with, or None
+        with self._lock:
+            self.counts["requests"] += 1
+            if self.quota_per_second:
+                window = int(time.time())
+                if window != self.window:
+                    self.window, self.window_calls = window, 0
+                self.window_calls += 1
+                if self.window_calls > self.quota_per_second:
+                    self.counts["throttled"] += 1
+                    return 429, {"Retry-After": "1"}
+            roll = self.random.random()
+            if roll < self.throttle_rate:
+                self.counts["throttled"] += 1
+                return 429, {}
+            if roll < self.throttle_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return 500, {}
+        return None
+
+    def delay(self):
+        pause = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if pause > 0:
+            time.sleep(pause)
+
+    # --- API calls: (method, path, query, body) -> (status, json) ---
+    def call(self, method, path, query, body):
+        path = path.rstrip("/")
+        if path == "/customsearch/v1":
+            return 200, self.search(query)
+        if not path.startswith("/gmail/v1/users/me"):
+            return 404, {"error": {"code": 404, "message": f"No such endpoint {path}"}}
+        path = path[len("/gmail/v1/users/me"):]
+        if method == "POST" and path == "/messages/send":
+            with self._lock:
+                self.counts["sent"] += 1
+                if self.reply_rate and self.random.random() < self.reply_rate:
+                    self._receive(f"recipient{self.counts['sent']}@example.com", "Re: campaign")
+                return 200, {"id": f"s{self.counts['sent']:x}", "threadId": f"s{self.counts['sent']:x}"}
+        if path == "/profile":
+            return 200, {"emailAddress": "bench@example.com", "historyId": str(self.history_id)}
+        if path == "/messages":
+            limit = int(query.get("maxResults", 100))
+            with self._lock:
+                ids = [m for _, m in self.history[-limit:]][::-1]
+            return 200, {"messages": [{"id": i, "threadId": i} for i in ids]}
+        if path.startswith("/messages/"):
+            msg = self.messages.get(path.rsplit("/", 1)[1])
+            return (200, msg) if msg else (404, {"error": {"code": 404, "message": "Not found"}})
+        if path == "/history":
+            start = int(query.get("startHistoryId", 0))
+            with self._lock:
+                added = [m for h, m in self.history if h > start]
+                current = self.history_id
+            return 200, {
+                "history": [{"messagesAdded": [{"message": {"id": m}}]} for m in added],
+                "historyId": str(current),
+            }
+        return 404, {"error": {"code": 404, "message": f"No such endpoint {path}"}}
+
+    def search(self, query):
+        q = query.get("q", "")
+        start = int(query.get("start", 1))
+        items = []
+        for i in range(start, start + 10):
+            slug = f"{zlib.crc32(f'{q}:{i}'.encode()) % 100000:05d}"
+            items.append({
+                "title": f"{q} curator {slug}",
+                "link": f"https://playlists.example.com/{slug}",
+                "snippet": f"Submissions: curator{slug}@example.com | follow for more {q}",
+            })
+        return {"items": items}
+
+    def batch(self, content_type, body):
+        # multipart/mixed of application/http parts, answered in kind
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        out_boundary = "batch_" + format(self.random.getrandbits(64), "x")
+        chunks = []
+        for part in message.get_payload():
+            content_id = (part["Content-ID"] or "").strip("<>")
+            request_line = part.get_payload().lstrip().split("\n", 1)[0].strip()
+            method, target, _ = request_line.split(" ", 2)
+            parsed = urllib.parse.urlsplit(target)
+            status, payload = self.call(method, parsed.path, dict(urllib.parse.parse_qsl(parsed.query)), b"")
+            data = json.dumps(payload)
+            chunks.append(
+                f"--{out_boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n{data}\r\n"
+            )
+        chunks.append(f"--{out_boundary}--\r\n")
+        return f"multipart/mixed; boundary={out_boundary}", "".join(chunks).encode()
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+        disable_nagle_algorithm = True   # headers and body go out as separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body, content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, method):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            url = urllib.parse.urlsplit(self.path)
+            if url.path == "/_stats":
+                with fake._lock:
+                    return self._reply(200, json.dumps(fake.counts).encode())
+            fake.delay()
+            failed = fake.fault()
+            if failed:
+                status, headers = failed
+                reason = "rateLimitExceeded" if status == 429 else "backendError"
+                error = {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}}
+                return self._reply(status, json.dumps(error).encode(), headers=headers)
+            if url.path.rstrip("/") == "/batch":
+                content_type, data = fake.batch(self.headers.get("Content-Type", ""), body)
+                return self._reply(200, data, content_type)
+            status, payload = fake.call(method, url.path, dict(urllib.parse.parse_qsl(url.query)), body)
+            self._reply(status, json.dumps(payload).encode())
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+    return Handler
+
+
+def serve(port=0, **knobs):
+    # Starts the server on a background thread; returns (server, base url)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(FakeGoogle(**knobs)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@contextmanager
+def spawn(**knobs):
+    # Runs the server in its own process, so its CPU time stays out of the
+    # measured client; yields the base url
+    args = [sys.executable, __file__, "--port", "0"]
+    for name, value in knobs.items():
+        args += [f"--{name.replace('_', '-')}", str(value)]
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+    try:
+        yield proc.stdout.readline().split()[-1]
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def fetch_stats(url):
+    import urllib.request
+    with urllib.request.urlopen(f"{url}/_stats") as resp:
+        return json.load(resp)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--quota-per-second", type=int, default=0)
+    parser.add_argument("--inbox", type=int, default=0)
+    parser.add_argument("--reply-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = vars(parser.parse_args())
+    port = args.pop("port")
+    server, url = serve(port, **args)
+    print(f"Fake Google APIs listening on {url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# campaign_cache.py — One in-memory copy of each campaign, shared by all sessions
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from campaign_utils import campaign_path, load_campaign_data, campaign_row_count
+
+CACHE_BUDGET_BYTES = int(float(os.environ.get("CAMPAIGN_CACHE_MB", 512)) * 1024 * 1024)
+
+
+class _Entry:
+    __slots__ = ("df", "version", "nbytes")
+
+    def __init__(self, df, version):
+        self.df = df
+        self.version = version
+        self.nbytes = int(df.memory_usage(deep=True).sum())
+
+
+def _file_version(name):
+    try:
+        st = os.stat(campaign_path(name))
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class CampaignCache:
+    # Frames are loaded from campaign_utils storage on first use and kept in
+    # LRU order. When the total passes `budget`, frames nobody holds a handle
+    # to go first, then the least recently used ones; an evicted frame is
+    # simply reloaded on its next access. A changed file on disk (new upload
+    # under the same name) is picked up by comparing mtime/size.
+
+    def __init__(self, budget=CACHE_BUDGET_BYTES):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.refs = {}
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        for pinned in (False, True):
+            for name in list(self.entries):
+                if self.nbytes <= self.budget:
+                    return
+                if (self.refs.get(name, 0) > 0) == pinned and len(self.entries) > 1:
+                    self.nbytes -= self.entries.pop(name).nbytes
+
+    def frame(self, name):
+        # A shallow copy: no data is duplicated, and with copy-on-write any
+        # edit a page makes lands in its own copy, never in the shared frame
+        version = _file_version(name)
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry.version == version:
+                self.entries.move_to_end(name)
+                return entry.df.copy(deep=False)
+        df = load_campaign_data(name)
+        if df is None:
+            return None
+        with self._lock:
+            old = self.entries.pop(name, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            entry = self.entries[name] = _Entry(df, version)
+            self.nbytes += entry.nbytes
+            self._evict()
+            return entry.df.copy(deep=False)
+
+    def acquire(self, name):
+        with self._lock:
+            self.refs[name] = self.refs.get(name, 0) + 1
+
+    def release(self, name):
+        with self._lock:
+            self.refs[name] = self.refs.get(name, 1) - 1
+            if self.refs[name] <= 0:
+                del self.refs[name]
+                self._evict()
+
+
+class CampaignHandle:
+    # What a session keeps instead of a DataFrame. The reference is dropped
+    # when the handle is garbage-collected (e.g. the session ends).
+
+    def __init__(self, name, cache):
+        self.name = name
+        self._cache = cache
+        cache.acquire(name)
+        self._finalizer = weakref.finalize(self, cache.release, name)
+
+    def frame(self):
+        return self._cache.frame(self.name)
+
+    def __len__(self):
+        return campaign_row_count(self.name)
+
+    def close(self):
+        self._finalizer()
+
+
+_cache = CampaignCache()
+
+
+def open_campaign(name):
+    return CampaignHandle(name, _cache)
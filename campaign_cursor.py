@@ -0,0 +1,127 @@
+# campaign_cursor.py — Persistent batch progress for a campaign
+
+import os
+import glob
+import json
+import pickle
+import re
+from file_lock import locked
+
+CURSOR_DIR = "logs/cursors"
+os.makedirs(CURSOR_DIR, exist_ok=True)
+
+# Pre-cursor format written by campaign_utils.save_sent_batch
+LEGACY_BATCH_DIR = "logs/batches"
+
+
+class CampaignCursor:
+    # `frontier` is the first batch not known to be complete; every batch
+    # below it is done. `done` holds completed batches above the frontier
+    # (batches can finish out of order) and `partial` the addresses already
+    # sent in batches still in progress. Sent sets of completed batches are
+    # archived to an append-only side file, so the cursor itself stays a few
+    # hundred addresses no matter how far the campaign has progressed.
+
+    def __init__(self, campaign, batch_size=500):
+        self.campaign = campaign
+        self.batch_size = batch_size
+        self.path = os.path.join(CURSOR_DIR, f"{campaign}.json")
+        self.archive_path = os.path.join(CURSOR_DIR, f"{campaign}.done.jsonl")
+        self.frontier = 0
+        self.done = set()
+        self.partial = {}
+        self._file_lock = None
+
+    # --- Locking + persistence (use as a context manager) ---
+    def __enter__(self):
+        self._file_lock = locked(self.path)
+        self._file_lock.__enter__()
+        try:
+            self._load()
+        except BaseException:
+            self._file_lock.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            if exc_type is None:
+                self._save()
+        finally:
+            self._file_lock.__exit__(None, None, None)
+            self._file_lock = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            migrated = self._migrate_legacy()
+            if migrated:
+                # The cursor is on disk before the legacy files are renamed,
+                # so a failure later in the `with` body loses no progress
+                self._save()
+                for path in migrated:
+                    os.replace(path, path + ".migrated")
+            return
+        with open(self.path) as f:
+            state = json.load(f)
+        if state["batch_size"] != self.batch_size:
+            raise ValueError(
+                f"Cursor for '{self.campaign}' uses batch_size={state['batch_size']}, not {self.batch_size}"
+            )
+        self.frontier = state["frontier"]
+        self.done = set(state["done"])
+        self.partial = {int(i): set(emails) for i, emails in state["partial"].items()}
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "batch_size": self.batch_size,
+                "frontier": self.frontier,
+                "done": sorted(self.done),
+                "partial": {str(i): sorted(emails) for i, emails in self.partial.items()},
+            }, f)
+        os.replace(tmp, self.path)
+
+    def _migrate_legacy(self):
+        # Folds legacy batch files into `partial`; returns the files read
+        migrated = []
+        pattern = os.path.join(LEGACY_BATCH_DIR, f"{glob.escape(self.campaign)}_batch*.pkl")
+        for path in glob.glob(pattern):
+            match = re.search(r"_batch(\d+)\.pkl$", path)
+            if not match:
+                continue
+            with open(path, "rb") as f:
+                sent = pickle.load(f)
+            self.partial.setdefault(int(match.group(1)), set()).update(sent)
+            migrated.append(path)
+        return migrated
+
+    # --- Progress ---
+    def sent(self, batch_number):
+        if batch_number in self.partial:
+            return self.partial[batch_number]
+        if self.is_complete(batch_number) and os.path.exists(self.archive_path):
+            with open(self.archive_path) as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["batch"] == batch_number:
+                        return set(record["sent"])
+        return set()
+
+    def add_sent(self, batch_number, emails):
+        if not self.is_complete(batch_number):
+            self.partial.setdefault(batch_number, set()).update(emails)
+
+    def is_complete(self, batch_number):
+        return batch_number < self.frontier or batch_number in self.done
+
+    def complete(self, batch_number):
+        if self.is_complete(batch_number):
+            return
+        sent = self.partial.pop(batch_number, set())
+        with open(self.archive_path, "a") as f:
+            f.write(json.dumps({"batch": batch_number, "sent": sorted(sent)}) + "\n")
+        self.done.add(batch_number)
+        while self.frontier in self.done:
+            self.done.discard(self.frontier)
+            self.frontier += 1
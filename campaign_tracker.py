@@ -0,0 +1,47 @@
+# campaign_tracker.py — Per-campaign tracker summaries for the dashboard
+
+import threading
+from send_ledger import get_ledger
+from event_stats import get_campaign_stats
+from campaign_utils import campaign_row_count
+
+_summaries = {}
+_summaries_lock = threading.Lock()
+
+
+def tracker_summary(campaign, total=None):
+    # Send/failure counts come from the ledger index and open/click counts
+    # from the event aggregates; both only read what was appended since the
+    # last call. The combined dict is rebuilt only when one of their
+    # versions (file inode + offset) or the campaign's row count moves, so
+    # an idle campaign costs a few stat() calls per rerun.
+    ledger = get_ledger(campaign)
+    ledger.refresh()
+    stats = get_campaign_stats(str(campaign))
+    stats.refresh()
+    if total is None:
+        total = campaign_row_count(campaign)
+    version = (ledger.version, stats.version, total)
+
+    with _summaries_lock:
+        cached = _summaries.get(campaign)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    sends = ledger.summary()
+    events = stats.counts()
+    sent = sends["sent"]
+    summary = {
+        "campaign": campaign,
+        "total": total,
+        "sent": sent,
+        "failed": sends["failed"],
+        "remaining": max(0, total - sends["recipients"]),
+        **events,
+        "open_rate": events["unique_opens"] / sent if sent else 0.0,
+        "click_rate": events["unique_clicks"] / sent if sent else 0.0,
+        "progress": min(1.0, sent / total) if total else 0.0,
+    }
+    with _summaries_lock:
+        _summaries[campaign] = (version, summary)
+    return summary
@@ -2,49 +2,165 @@
 
 import os
 import pandas as pd
-import pickle
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
+from campaign_cursor import CampaignCursor
+from file_lock import locked
+import metrics
 
 CAMPAIGN_DIR = "campaigns"
 os.makedirs(CAMPAIGN_DIR, exist_ok=True)
 
+# Campaigns are stored as Parquet in row groups of ROW_GROUP_SIZE rows, a
+# multiple of BATCH_SIZE so one send batch never spans two row groups
+BATCH_SIZE = 500
+ROW_GROUP_SIZE = BATCH_SIZE * 20
+
+def campaign_path(campaign_name):
+    return os.path.join(CAMPAIGN_DIR, f"{campaign_name}.parquet")
+
+def legacy_csv_path(campaign_name):
+    return os.path.join(CAMPAIGN_DIR, f"{campaign_name}.csv")
+
 # Save uploaded campaign data to file
 def save_campaign_data(campaign_name, df):
-    path = os.path.join(CAMPAIGN_DIR, f"{campaign_name}.csv")
-    df.to_csv(path, index=False)
+    path = campaign_path(campaign_name)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (e.g. phone numbers) are stored as text
+        text_cols = df.select_dtypes(include="object").columns
+        table = pa.Table.from_pandas(df.astype({c: "string" for c in text_cols}), preserve_index=False)
+    tmp = f"{path}.{os.getpid()}.tmp"  # concurrent saves never share a temp file
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+
+# Stream an old-style campaigns/<name>.csv into Parquet, one row group at a time.
+# Locked per campaign, since every process opening a legacy campaign imports it.
+def import_campaign_csv(campaign_name, csv_path=None):
+    csv_path = csv_path or legacy_csv_path(campaign_name)
+    path = campaign_path(campaign_name)
+    with locked(path):
+        if not os.path.exists(csv_path):  # already imported by another process
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        writer = None
+        try:
+            for chunk in pd.read_csv(csv_path, dtype=str, chunksize=ROW_GROUP_SIZE):
+                if writer is None:
+                    schema = pa.schema([(col, pa.string()) for col in chunk.columns])
+                    writer = pq.ParquetWriter(tmp, schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:  # empty CSV
+            return
+        os.replace(tmp, path)
+        if csv_path == legacy_csv_path(campaign_name):
+            os.replace(csv_path, csv_path + ".imported")
+
+def _open_campaign(campaign_name):
+    path = campaign_path(campaign_name)
+    if not os.path.exists(path) and os.path.exists(legacy_csv_path(campaign_name)):
+        import_campaign_csv(campaign_name)
+    return pq.ParquetFile(path) if os.path.exists(path) else None
+
+def list_campaigns():
+    names = set()
+    for f in os.listdir(CAMPAIGN_DIR):
+        name, ext = os.path.splitext(f)
+        if ext in (".parquet", ".csv"):
+            names.add(name)
+    return sorted(names)
 
-# Load campaign from disk
+# Load campaign from disk (whole table; prefer the readers below for big lists)
 def load_campaign_data(campaign_name):
-    path = os.path.join(CAMPAIGN_DIR, f"{campaign_name}.csv")
-    return pd.read_csv(path) if os.path.exists(path) else None
+    pf = _open_campaign(campaign_name)
+    return pf.read().to_pandas() if pf else None
+
+# Row counts are remembered per file version, so repeated calls are one stat()
+_row_counts = {}
+
+def campaign_row_count(campaign_name):
+    path = campaign_path(campaign_name)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        pf = _open_campaign(campaign_name)  # may import a legacy CSV
+        return pf.metadata.num_rows if pf else 0
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _row_counts.get(campaign_name)
+    if cached is None or cached[0] != version:
+        cached = _row_counts[campaign_name] = (version, pq.ParquetFile(path).metadata.num_rows)
+    return cached[1]
+
+# Rows [start, stop), reading only the row groups that overlap them
+def read_campaign_rows(campaign_name, start, stop):
+    pf = _open_campaign(campaign_name)
+    if pf is None:
+        return None
+    groups, first_row, offset = [], None, 0
+    for g in range(pf.metadata.num_row_groups):
+        rows = pf.metadata.row_group(g).num_rows
+        if offset + rows > start and offset < stop:
+            groups.append(g)
+            if first_row is None:
+                first_row = offset
+        offset += rows
+    if not groups:
+        return pf.schema_arrow.empty_table().to_pandas()
+    table = pf.read_row_groups(groups).slice(start - first_row, stop - start)
+    df = table.to_pandas()
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+# Stream the campaign in chunks with bounded memory
+def iter_campaign_chunks(campaign_name, chunk_rows=ROW_GROUP_SIZE):
+    pf = _open_campaign(campaign_name)
+    if pf is None:
+        return
+    start = 0
+    for record_batch in pf.iter_batches(batch_size=chunk_rows):
+        df = record_batch.to_pandas()
+        df.index = pd.RangeIndex(start, start + len(df))
+        start += len(df)
+        yield df
 
 # Split large DataFrame into daily batches (e.g., 500 per day)
 def split_batches(df, batch_size=500):
     batches = [df[i:i + batch_size] for i in range(0, df.shape[0], batch_size)]
     return batches
 
-# Optional: load batches separately
-BATCH_LOG_DIR = "logs/batches"
-os.makedirs(BATCH_LOG_DIR, exist_ok=True)
+# Batch progress lives in a per-campaign cursor (see campaign_cursor.py);
+# legacy logs/batches/*.pkl files are imported on first use
 
 def save_sent_batch(campaign_name, batch_number, sent_emails):
-    path = os.path.join(BATCH_LOG_DIR, f"{campaign_name}_batch{batch_number}.pkl")
-    with open(path, "wb") as f:
-        pickle.dump(sent_emails, f)
+    with CampaignCursor(campaign_name, BATCH_SIZE) as cursor:
+        cursor.add_sent(batch_number, sent_emails)
 
 def load_sent_batch(campaign_name, batch_number):
-    path = os.path.join(BATCH_LOG_DIR, f"{campaign_name}_batch{batch_number}.pkl")
-    if os.path.exists(path):
-        with open(path, "rb") as f:
-            return pickle.load(f)
-    return set()
-
-# Get next unsent batch
-def get_next_batch(df, campaign_name):
-    batches = split_batches(df)
-    for i, batch in enumerate(batches):
-        sent = load_sent_batch(campaign_name, i)
-        unsent_batch = batch[~batch["email"].isin(sent)]
-        if not unsent_batch.empty:
-            return i, unsent_batch
+    with CampaignCursor(campaign_name, BATCH_SIZE) as cursor:
+        return set(cursor.sent(batch_number))
+
+NEXT_BATCH_SECONDS = metrics.histogram("get_next_batch_seconds", "Time to find and read the next unsent batch")
+
+# Get next unsent batch, starting at the cursor's frontier instead of batch 0.
+# With df=None only that batch's rows are read from the campaign store.
+# Batch numbers in `skip` (e.g. leased to another worker) are passed over.
+@NEXT_BATCH_SECONDS.time()
+def get_next_batch(df, campaign_name, batch_size=BATCH_SIZE, skip=()):
+    total = df.shape[0] if df is not None else campaign_row_count(campaign_name)
+    with CampaignCursor(campaign_name, batch_size) as cursor:
+        i = cursor.frontier
+        while i * batch_size < total:
+            if i not in skip and not cursor.is_complete(i):
+                start, stop = i * batch_size, (i + 1) * batch_size
+                batch = df.iloc[start:stop] if df is not None else read_campaign_rows(campaign_name, start, stop)
+                unsent_batch = batch[~batch["email"].isin(cursor.sent(i))]
+                if not unsent_batch.empty:
+                    return i, unsent_batch
+                cursor.complete(i)
+            i += 1
     return None, None
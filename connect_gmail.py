@@ -1,40 +1,73 @@
 import streamlit as st
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from email.mime.text import MIMEText
-import base64
-import time
-import pickle
-import os
+import threading
+import weakref
+from gmail_client import GmailClient, build_raw_message
+from inbox_sync import InboxSync, bounced_recipients
+from send_ledger import get_ledger
+from suppression import get_suppression_list, suppress
+from followup_scheduler import get_scheduler, reply_senders
+import metrics
+
+_delegated_creds = None
 
 # --- Gmail Login ---
 def login_to_gmail():
+    global _delegated_creds
+    if _delegated_creds is not None:
+        return _delegated_creds
     try:
         secrets_dict = dict(st.secrets["gmail_service"])
         creds = service_account.Credentials.from_service_account_info(
             secrets_dict,
             scopes=["https://www.googleapis.com/auth/gmail.modify"]
         )
-        delegated_creds = creds.with_subject(secrets_dict["gmail_user"])
-        return delegated_creds
+        _delegated_creds = creds.with_subject(secrets_dict["gmail_user"])
+        return _delegated_creds
     except Exception as e:
         raise RuntimeError("Gmail login failed: " + str(e))
 
+# --- Shared Gmail Client (one per credentials object) ---
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+def get_gmail_client(creds=None):
+    if isinstance(creds, GmailClient):
+        return creds
+    if creds is None:
+        creds = login_to_gmail()
+    with _clients_lock:
+        client = _clients.get(creds)
+        if client is None:
+            client = _clients[creds] = GmailClient(creds)
+    return client
+
 # --- Send Email ---
+SEND_SECONDS = metrics.histogram("send_seconds", "Time to send one email, including retries", ("path",))
+SENDS = metrics.counter("sends_total", "Emails handled, by outcome", ("path", "outcome"))
+
+@SEND_SECONDS.labels("direct").time()
 def send_email(creds, to, subject, message_text, campaign=None):
+    result = _send_email(creds, to, subject, message_text, campaign)
+    SENDS.labels("direct", result.get("status", "failed")).inc()
+    return result
+
+def _send_email(creds, to, subject, message_text, campaign):
     try:
-        service = build("gmail", "v1", credentials=creds)
-        message = MIMEText(message_text, "html")
-        message["to"] = to
-        message["subject"] = subject
-        raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        body = {"raw": raw}
-
-        sent_log = load_campaign_log(campaign)
-        if any(entry[0] == to for entry in sent_log):
+        suppressed = get_suppression_list()
+        suppressed.refresh()
+        if to in suppressed:
+            return {"status": "suppressed", "message": "Address is on the suppression list."}
+
+        client = get_gmail_client(creds)
+        raw = build_raw_message(to, subject, message_text)
+
+        ledger = get_ledger(campaign)
+        ledger.refresh()
+        if to in ledger:
             return {"status": "duplicate", "message": "Already sent to this email."}
 
-        service.users().messages().send(userId="me", body=body).execute()
+        client.send_raw(raw)
         log_campaign_email(campaign, to, "success")
         return {"status": "success"}
 
@@ -43,49 +76,54 @@ def send_email(creds, to, subject, message_text, campaign=None):
         return {"error": str(e)}
 
 # --- Send Follow-Up (after delay) ---
-def send_follow_up(creds, to, subject, message_text, delay_minutes=10):
-    time.sleep(delay_minutes * 60)
+# Queued in the follow-up journal and sent by worker.py once due; returns the job id.
+# `step` numbers successive follow-ups to the same contact (1, 2, ...).
+def send_follow_up(creds, to, subject, message_text, delay_minutes=10, campaign=None, step=1):
     follow_up_subject = f"Re: {subject}"
     follow_up_text = f"Just following up on my previous message:\n\n{message_text}"
-    send_email(creds, to, follow_up_subject, follow_up_text)
+    return get_scheduler().schedule([{
+        "email": to,
+        "subject": follow_up_subject,
+        "body": follow_up_text,
+        "campaign": campaign,
+        "step": step,
+        "delay": delay_minutes * 60,
+    }])[0]
 
 # --- Campaign Logging ---
 def log_campaign_email(campaign, email, status):
-    log_path = f"campaign_log_{campaign}.pkl"
-    if os.path.exists(log_path):
-        with open(log_path, "rb") as f:
-            log = pickle.load(f)
-    else:
-        log = []
-    log.append((email, status))
-    with open(log_path, "wb") as f:
-        pickle.dump(log, f)
+    get_ledger(campaign).append(email, status)
 
 def load_campaign_log(campaign):
-    log_path = f"campaign_log_{campaign}.pkl"
-    if os.path.exists(log_path):
-        with open(log_path, "rb") as f:
-            return pickle.load(f)
-    return []
+    ledger = get_ledger(campaign)
+    ledger.refresh()
+    return ledger.entries()
 
 # --- Inbox Fetch: Replies ---
+_inbox_syncs = weakref.WeakKeyDictionary()
+
+def get_inbox_sync(creds=None):
+    client = get_gmail_client(creds)
+    with _clients_lock:
+        sync = _inbox_syncs.get(client)
+        if sync is None:
+            sync = _inbox_syncs[client] = InboxSync(client)
+    return sync
+
+# Polls the inbox and cancels pending follow-ups to anyone who has replied;
+# addresses that bounced are suppressed for every campaign
+def sync_replies(creds=None, thread_limit=20):
+    replies, new = get_inbox_sync(creds).poll(thread_limit)
+    if new:
+        bounced = bounced_recipients(new)
+        if bounced:
+            suppress(bounced, "bounce")
+        get_scheduler().cancel_for(reply_senders(new) | bounced)
+    return replies, new
+
 def fetch_replies(creds, thread_limit=20):
     try:
-        service = build("gmail", "v1", credentials=creds)
-        results = service.users().messages().list(userId="me", q="is:inbox", maxResults=thread_limit).execute()
-        messages = results.get("messages", [])
-
-        replies = []
-        for msg in messages:
-            full_msg = service.users().messages().get(userId="me", id=msg["id"], format="metadata", metadataHeaders=["From", "Subject"]).execute()
-            snippet = full_msg.get("snippet", "")
-            headers = full_msg.get("payload", {}).get("headers", [])
-            sender = next((h["value"] for h in headers if h["name"] == "From"), "Unknown")
-            replies.append({
-                "id": msg["id"],
-                "from": sender,
-                "snippet": snippet,
-            })
+        replies, _ = sync_replies(creds, thread_limit)
         return replies
     except Exception as e:
         print("Error fetching replies:", e)
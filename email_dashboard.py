@@ -1,16 +1,17 @@
 # dashboard.py (Master UI - Unified Navigation & All Features)
 
 import streamlit as st
-import pandas as pd
+import importlib
+from functools import partial
 if "campaigns" not in st.session_state:
     st.session_state["campaigns"] = {}
-import os
-from connect_gmail import login_to_gmail, send_email, load_campaign_log, fetch_replies
-from campaign_utils import split_batches, load_campaign_data, save_campaign_data
-from scraper_module import google_search, extract_emails
-from datetime import datetime
-from playlist_unlock import run_playlist_unlock
-import matplotlib.pyplot as plt
+
+# Page code and the heavy libraries behind it (pandas, Arrow, the Google API
+# client) are imported inside each page, so a rerun only pays for the page
+# being shown and the first visit to a page pays for its imports once.
+
+# Fallbacks for placeholders whose column is missing or blank
+TEMPLATE_DEFAULTS = {"name": "friend"}
 
 st.set_page_config(page_title="📧 GhostBot Dashboard", layout="wide", initial_sidebar_state="expanded")
 
@@ -32,24 +33,8 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# --- Unified Sidebar Navigation ---
-nav = st.sidebar.radio("🚀 Navigate", [
-    "🏠 Home",
-    "📂 Upload or Search Contacts",
-    "🧠 Preview & Personalize",
-    "✉️ Send Emails",
-    "📊 Email Tracker",
-    "🔓 Unlock Playlist Contacts",
-    "📣 Social Media Campaigns",
-    "📺 Ads Campaigns",
-    "🌐 Creator Website & EPK",
-    "💬 Creator Forum",
-    "💡 Creator Match",
-    "📚 Resources & Blog"
-])
-
 # --- Home ---
-if nav == "🏠 Home":
+def page_home():
     st.header("🏠 Welcome to GhostBot")
     st.markdown("""
     Welcome to **GhostBot**, the ultimate platform for creators, musicians, and influencers to grow and manage their campaigns.
@@ -65,11 +50,16 @@ if nav == "🏠 Home":
     """)
 
 # --- Upload or Search ---
-elif nav == "📂 Upload or Search Contacts":
+def page_contacts():
+    import pandas as pd
+    from campaign_utils import save_campaign_data
+    from campaign_cache import open_campaign
+
     st.header("📂 Upload File OR Search Online")
     method = st.radio("Choose Method", ["Upload File", "Web Search"])
 
     if method == "Upload File":
+        from suppression import get_suppression_list
         uploaded_file = st.file_uploader("Upload CSV or Excel", type=["csv", "xlsx"])
         campaign_name = st.text_input("Campaign Name")
         if uploaded_file and campaign_name:
@@ -81,41 +71,81 @@ elif nav == "📂 Upload or Search Contacts":
             else:
                 df.rename(columns={email_columns[0]: "email"}, inplace=True)
                 df = df.dropna(subset=["email"])
-                st.session_state.campaigns[campaign_name] = df
+                suppression = get_suppression_list()
+                suppression.refresh()
+                df, suppressed = suppression.filter_frame(df)
+                if not suppressed.empty:
+                    st.info(f"🚫 Removed {len(suppressed)} suppressed address(es) (bounced, unsubscribed or complained).")
                 save_campaign_data(campaign_name, df)
+                st.session_state.campaigns[campaign_name] = open_campaign(campaign_name)
                 st.success("Uploaded Successfully!")
                 st.dataframe(df.head())
 
     else:
-        keyword = st.text_input("Search Keywords")
+        from scraper_module import google_search, google_search_many, extract_emails
+        keyword = st.text_input("Search Keywords (comma-separated)")
         pages = st.slider("Pages", 1, 10, 3)
         if st.button("🔍 Search") and keyword:
-            res = google_search(keyword, st.secrets["google"]["api_key"], st.secrets["google"]["cse_id"], pages)
-            emails = extract_emails(res)
-            st.success(f"Found {len(emails)} emails.")
-            df = pd.DataFrame({"email": emails, "source": keyword})
+            keywords = [k.strip() for k in keyword.split(",") if k.strip()]
+            api_key, cse_id = st.secrets["google"]["api_key"], st.secrets["google"]["cse_id"]
+            if len(keywords) == 1:
+                res = google_search(keywords[0], api_key, cse_id, pages)
+                rows = [{"email": e, "source": keywords[0]} for e in extract_emails(res)]
+            else:
+                # Pages from all keywords are fetched together; show progress as they land
+                rows, seen = [], set()
+                progress = st.progress(0.0)
+                total = len(keywords) * pages
+                for done, (kw, page, res) in enumerate(google_search_many(keywords, api_key, cse_id, pages), 1):
+                    if isinstance(res, Exception):
+                        st.warning(f"Error on '{kw}' page {page + 1}: {res}")
+                    else:
+                        for e in extract_emails(res):
+                            if e not in seen:
+                                seen.add(e)
+                                rows.append({"email": e, "source": kw})
+                    progress.progress(done / total, text=f"{done}/{total} pages · {len(rows)} emails")
+            st.success(f"Found {len(rows)} emails.")
+            df = pd.DataFrame(rows, columns=["email", "source"])
             st.dataframe(df)
             name = st.text_input("Save Search as Campaign")
             if st.button("💾 Save Campaign") and name:
-                st.session_state.campaigns[name] = df
                 save_campaign_data(name, df)
+                st.session_state.campaigns[name] = open_campaign(name)
                 st.success("Saved successfully")
 
+    with st.expander("🚫 Suppress Addresses"):
+        from suppression import REASONS, suppress
+        addresses = st.text_area("Addresses (one per line or comma-separated)")
+        reason = st.selectbox("Reason", [r for r in REASONS if r != "bounce"])
+        if st.button("Suppress") and addresses.strip():
+            emails = [a.strip() for a in addresses.replace(",", "\n").splitlines() if "@" in a]
+            st.success(f"Suppressed {suppress(emails, reason)} new address(es) for all campaigns.")
+
 # --- Preview ---
-elif nav == "🧠 Preview & Personalize":
+def page_preview():
+    import pandas as pd
+    from email_template import EmailTemplate
+
     st.header("🧠 Email Personalization")
     if not st.session_state.get("campaigns"):
         st.warning("Upload or Search Contacts first")
     else:
         campaign = st.selectbox("Select Campaign", list(st.session_state.campaigns))
         style = st.selectbox("Tone", ["Formal", "Gen Z", "Chill", "Hype"])
-        msg = st.text_area("Message", value=f"Thanks {{name}}, just checking in!")
-        df = st.session_state.campaigns[campaign].copy()
-        df["preview"] = df["email"].apply(lambda x: msg.replace("{name}", x.split("@")[0]))
-        st.dataframe(df[["email", "preview"]])
+        msg = st.text_area("Message", value="Thanks {name}, just checking in!")
+        st.caption("Use {column} for any contact column, {column|fallback} for a default.")
+        df = st.session_state.campaigns[campaign].frame()
+        template = EmailTemplate(msg, TEMPLATE_DEFAULTS)
+        missing = template.missing_fields(df.columns)
+        if missing:
+            st.warning(f"No column for: {', '.join(missing)} (rendered empty)")
+        st.dataframe(pd.DataFrame({"email": df["email"], "preview": template.render_frame(df)}))
 
 # --- Send ---
-elif nav == "✉️ Send Emails":
+def page_send():
+    from send_jobs import enqueue_send, ensure_runner, list_jobs, cancel_job
+
     st.header("✉️ Send Campaign")
     if not st.session_state.get("campaigns"):
         st.warning("No campaign selected")
@@ -124,54 +154,64 @@ elif nav == "✉️ Send Emails":
         subject = st.text_input("Subject")
         message = st.text_area("Body")
         if st.button("🚀 Send Now"):
-            creds = login_to_gmail()
-            for _, row in st.session_state.campaigns[campaign].iterrows():
-                send_email(creds, row["email"], subject, message.replace("{name}", row.get("name", "friend")), campaign)
-            st.success("Emails Sent!")
+            # Runs in a background runner process; this page only polls progress
+            try:
+                job_id = enqueue_send(campaign, subject, message, TEMPLATE_DEFAULTS)
+                st.success(f"Queued send job {job_id}")
+            except ValueError as e:
+                st.warning(str(e))
+        ensure_runner()  # also resumes jobs left over from a restart
+
+        @st.fragment(run_every=3)
+        def send_job_progress():
+            for job in list_jobs(campaign, limit=5):
+                p = job["progress"]
+                st.markdown(f"**Job {job['id']}** — {job['status']}")
+                sent, failed, rate, eta = st.columns(4)
+                sent.metric("Sent", p["sent"])
+                failed.metric("Failed", p["failed"])
+                rate.metric("Rate", f"{p['rate']}/s")
+                eta.metric("ETA", f"{p['eta'] // 60}m {p['eta'] % 60}s" if p["eta"] is not None else "—")
+                st.progress(min(1.0, job["next_row"] / p["total"]) if p["total"] else 0.0)
+                if job["error"]:
+                    st.error(job["error"])
+                if job["status"] in ("queued", "running") and st.button("✖ Cancel", key=f"cancel_{job['id']}"):
+                    cancel_job(job["id"])
+
+        send_job_progress()
 
 # --- Tracker ---
-elif nav == "📊 Email Tracker":
+def page_tracker():
+    from campaign_tracker import tracker_summary
+
     st.header("📊 Campaign Tracker")
     for name in st.session_state.get("campaigns", {}):
-        log = load_campaign_log(name)
-        sent = [x[0] for x in log if x[1] == "success"]
-        failed = [x for x in log if x[1] != "success"]
+        summary = tracker_summary(name)
         st.subheader(f"📦 {name}")
-        st.metric("Total", len(st.session_state.campaigns[name]))
-        st.metric("Sent", len(sent))
-        st.metric("Failed", len(failed))
-        st.progress(len(sent)/max(1, len(st.session_state.campaigns[name])))
-
-elif nav == "🔓 Unlock Playlist Contacts":
-    run_playlist_unlock()
-
-# --- Social Campaigns ---
-elif nav == "📣 Social Media Campaigns":
-    st.header("📣 Schedule Social Content")
-    st.text("Coming soon: Threads, IG, TikTok scheduler with caption AI")
-
-# --- Ads Campaigns ---
-elif nav == "📺 Ads Campaigns":
-    st.header("📺 Launch Meta or YouTube Ads")
-    st.text("Coming soon: Simple ad setup with targeting + auto cover art")
-
-# --- Website & EPK ---
-elif nav == "🌐 Creator Website & EPK":
-    st.header("🌐 Create EPK or Artist Page")
-    st.text("Coming soon: Choose template, upload images + auto bio builder")
-
-# --- Forum ---
-elif nav == "💬 Creator Forum":
-    st.header("💬 Chat & Ask Questions")
-    st.text("Coming soon: AMA & collab rooms with other GhostBot users")
-
-# --- Match ---
-elif nav == "💡 Creator Match":
-    st.header("💡 Match with Collaborators")
-    st.text("Coming soon: Tinder-style swipe to connect with producers, singers, etc.")
+        total, sent, failed, opens, clicks = st.columns(5)
+        total.metric("Total", summary["total"])
+        sent.metric("Sent", summary["sent"])
+        failed.metric("Failed", summary["failed"])
+        opens.metric("Opens", summary["unique_opens"], f"{summary['open_rate']:.0%}", delta_color="off")
+        clicks.metric("Clicks", summary["unique_clicks"], f"{summary['click_rate']:.0%}", delta_color="off")
+        st.progress(summary["progress"])
+
+# --- Placeholder pages ---
+COMING_SOON = {
+    "📣 Social Media Campaigns": ("📣 Schedule Social Content", "Coming soon: Threads, IG, TikTok scheduler with caption AI"),
+    "📺 Ads Campaigns": ("📺 Launch Meta or YouTube Ads", "Coming soon: Simple ad setup with targeting + auto cover art"),
+    "🌐 Creator Website & EPK": ("🌐 Create EPK or Artist Page", "Coming soon: Choose template, upload images + auto bio builder"),
+    "💬 Creator Forum": ("💬 Chat & Ask Questions", "Coming soon: AMA & collab rooms with other GhostBot users"),
+    "💡 Creator Match": ("💡 Match with Collaborators", "Coming soon: Tinder-style swipe to connect with producers, singers, etc."),
+}
+
+def coming_soon(nav):
+    header, text = COMING_SOON[nav]
+    st.header(header)
+    st.text(text)
 
 # --- Blog ---
-elif nav == "📚 Resources & Blog":
+def page_blog():
     st.header("📚 Growth Tips & Freebies")
     st.markdown("""
     ✅ Free sample packs
@@ -179,3 +219,27 @@ elif nav == "📚 Resources & Blog":
     ✅ Submission sites
     ✅ Growth guides
     """)
+
+# --- Lazy page registry ---
+# A callable, or "module:function" imported the first time the page is opened
+PAGES = {
+    "🏠 Home": page_home,
+    "📂 Upload or Search Contacts": page_contacts,
+    "🧠 Preview & Personalize": page_preview,
+    "✉️ Send Emails": page_send,
+    "📊 Email Tracker": page_tracker,
+    "🔓 Unlock Playlist Contacts": "playlist_unlock:run_playlist_unlock",
+    **{nav: partial(coming_soon, nav) for nav in COMING_SOON},
+    "📚 Resources & Blog": page_blog,
+}
+
+def resolve_page(nav):
+    page = PAGES[nav]
+    if isinstance(page, str):
+        module, func = page.split(":")
+        page = getattr(importlib.import_module(module), func)
+    return page
+
+# --- Unified Sidebar Navigation ---
+nav = st.sidebar.radio("🚀 Navigate", list(PAGES))
+resolve_page(nav)()
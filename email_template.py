@@ -0,0 +1,120 @@
+# email_template.py — Parse-once templates with {column} placeholders
+
+import re
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+STRING = "string[pyarrow]"
+
+# {column}, {column|default}; {{ and }} are literal braces. Only identifiers
+# are placeholders, so CSS rules and JSON in a template are left as written.
+PLACEHOLDER_RE = re.compile(r"\{\{|\}\}|\{([A-Za-z_]\w*)(?:\|([^{}]*))?\}")
+
+
+class EmailTemplate:
+    def __init__(self, text, defaults=None):
+        self.text = text or ""
+        self.defaults = dict(defaults or {})
+        self.parts = []  # literal strings and (field, inline default) tuples
+        pos = 0
+        for match in PLACEHOLDER_RE.finditer(self.text):
+            self._literal(self.text[pos:match.start()])
+            token = match.group(0)
+            if token in ("{{", "}}"):
+                self._literal(token[0])
+            else:
+                self.parts.append((match.group(1), match.group(2)))
+            pos = match.end()
+        self._literal(self.text[pos:])
+
+    def _literal(self, text):
+        if not text:
+            return
+        if self.parts and isinstance(self.parts[-1], str):
+            self.parts[-1] += text
+        else:
+            self.parts.append(text)
+
+    @property
+    def fields(self):
+        return [p[0] for p in self.parts if isinstance(p, tuple)]
+
+    def missing_fields(self, columns, overrides=None):
+        # Placeholders with no matching column and no default of any kind
+        columns = set(columns) | set(overrides or ())
+        return [
+            field for field, inline in (p for p in self.parts if isinstance(p, tuple))
+            if field not in columns and inline is None and field not in self.defaults
+        ]
+
+    def _default(self, field, inline, defaults):
+        if inline is not None:
+            return inline
+        return defaults.get(field, self.defaults.get(field, ""))
+
+    # --- One recipient ---
+    def render(self, row, defaults=None, overrides=None):
+        # `defaults` fill blanks in the row; `overrides` (fields the caller
+        # computes itself, like today's date) win over any row column
+        defaults = defaults or {}
+        overrides = overrides or {}
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            field, inline = part
+            if field in overrides:
+                out.append(str(overrides[field]))
+                continue
+            value = row.get(field) if hasattr(row, "get") else None
+            if value is None or value != value or str(value).strip() == "":
+                value = self._default(field, inline, defaults)
+            out.append(str(value))
+        return "".join(out)
+
+    # --- Whole batch, column-wise ---
+    def render_frame(self, df, defaults=None, overrides=None):
+        # `defaults` and `overrides` (as in render) may be scalars or Series
+        # aligned with df. All the work happens in Arrow kernels, one pass
+        # per placeholder.
+        defaults = defaults or {}
+        overrides = overrides or {}
+        pieces = []
+        for part in self.parts:
+            if isinstance(part, str):
+                pieces.append(part)
+                continue
+            field, inline = part
+            if field in overrides:
+                value = overrides[field]
+                pieces.append(pc.fill_null(_to_arrow(value), "") if isinstance(value, pd.Series) else str(value))
+                continue
+            default = self._default(field, inline, defaults)
+            if isinstance(default, pd.Series):
+                default = pc.fill_null(_to_arrow(default), "")
+            else:
+                default = str(default)
+            if field in df.columns:
+                values = pc.fill_null(_to_arrow(df[field]), "")
+                blank = pc.equal(pc.utf8_trim_whitespace(values), "")
+                values = pc.if_else(blank, default, values)
+            else:
+                values = default
+            pieces.append(values)
+        if not any(isinstance(p, pa.Array) for p in pieces):
+            text = "".join(pieces)
+            return pd.Series(text, index=df.index, dtype=STRING)
+        rendered = pc.binary_join_element_wise(*pieces, "")
+        return pd.Series(pd.array(rendered, dtype=STRING), index=df.index)
+
+
+def _to_arrow(series):
+    try:
+        arr = pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):  # mixed-type object column
+        arr = pa.array(series.map(str, na_action="ignore"), from_pandas=True)
+    if arr.type != pa.string():
+        arr = pc.cast(arr, pa.string())
+    return arr
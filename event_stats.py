@@ -0,0 +1,220 @@
+# event_stats.py — Incrementally maintained per-campaign open/click aggregates
+
+import os
+import json
+import time
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from event_store import TRACK_LOG_DIR, event_path, migrate_legacy, safe_name
+
+EVENT_TYPES = ("open", "click")
+SNAPSHOT_INTERVAL = 30  # seconds between persisted snapshots
+
+
+def stats_path(campaign):
+    return os.path.join(TRACK_LOG_DIR, f"{safe_name(campaign)}_stats.json")
+
+
+def _hour(timestamp):
+    return timestamp[:13]  # "YYYY-MM-DDTHH"
+
+
+def parse_time_bound(value, end=False):
+    # ISO date or datetime -> naive UTC ISO string, comparable with event
+    # timestamps. A date-only `end` bound covers that whole day. Raises
+    # ValueError for anything else.
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and len(value.strip()) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return parsed.isoformat()
+
+
+class _EventAggregate:
+    # Totals for one event file plus how far into it we have read. `hours`
+    # counts events per hour; `hour_offsets` is the first byte offset seen
+    # for each hour, used to seek when querying raw events by time range.
+    # Lines that aren't valid events are skipped and counted in `bad_lines`.
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.total = state.get("total", 0)
+        self.by_email = Counter(state.get("by_email", {}))
+        self.hours = Counter(state.get("hours", {}))
+        self.hour_offsets = state.get("hour_offsets", {})
+        self.offset = state.get("offset", 0)
+        self.inode = state.get("inode")
+        self.bad_lines = state.get("bad_lines", 0)
+
+    def state(self):
+        return {
+            "total": self.total,
+            "by_email": self.by_email,
+            "hours": self.hours,
+            "hour_offsets": self.hour_offsets,
+            "offset": self.offset,
+            "inode": self.inode,
+            "bad_lines": self.bad_lines,
+        }
+
+    def catch_up(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if self.inode is not None and st.st_ino != self.inode:
+            self.__init__()  # file was rewritten (e.g. legacy migration)
+        self.inode = st.st_ino
+        if st.st_size <= self.offset:
+            return False
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                start = self.offset
+                self.offset += len(line)
+                try:
+                    event = json.loads(line)
+                    hour = _hour(event["timestamp"])
+                    event_id = event["id"]
+                except (ValueError, KeyError, TypeError):
+                    self.bad_lines += 1
+                    continue
+                self.total += 1
+                self.hours[hour] += 1
+                if hour not in self.hour_offsets or start < self.hour_offsets[hour]:
+                    self.hour_offsets[hour] = start
+                if ":" in event_id:
+                    self.by_email[event_id.split(":")[1]] += 1
+        return True
+
+
+class CampaignStats:
+    def __init__(self, campaign):
+        self.campaign = campaign
+        self._lock = threading.Lock()
+        self._response = None
+        self._saved_at = time.monotonic()
+        state = {}
+        path = stats_path(campaign)
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+        self.events = {t: _EventAggregate(state.get(t)) for t in EVENT_TYPES}
+
+    def refresh(self):
+        # Reads only events appended since the previous refresh
+        with self._lock:
+            changed = False
+            for event_type, agg in self.events.items():
+                migrate_legacy(self.campaign, event_type)
+                changed |= agg.catch_up(event_path(self.campaign, event_type))
+            if changed:
+                self._response = None
+                if time.monotonic() - self._saved_at >= SNAPSHOT_INTERVAL:
+                    self._save()
+
+    def _save(self):
+        path = stats_path(self.campaign)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({t: agg.state() for t, agg in self.events.items()}, f)
+        os.replace(tmp, path)
+        self._saved_at = time.monotonic()
+
+    def summary(self):
+        # Serialized once per change; unchanged polls reuse the same payload
+        self.refresh()
+        with self._lock:
+            if self._response is None:
+                opens, clicks = self.events["open"], self.events["click"]
+                self._response = {
+                    "campaign": self.campaign,
+                    "opens": opens.total,
+                    "clicks": clicks.total,
+                    "unique_opens": len(opens.by_email),
+                    "unique_clicks": len(clicks.by_email),
+                    "open_by_email": dict(opens.by_email),
+                    "click_by_email": dict(clicks.by_email),
+                    "open_by_hour": dict(sorted(opens.hours.items())),
+                    "click_by_hour": dict(sorted(clicks.hours.items())),
+                    "skipped_lines": opens.bad_lines + clicks.bad_lines,
+                }
+            return self._response
+
+    @property
+    def version(self):
+        # Changes whenever new events have been folded in
+        return tuple((agg.inode, agg.offset) for agg in self.events.values())
+
+    def counts(self):
+        # Just the headline numbers, without copying the per-address maps
+        self.refresh()
+        with self._lock:
+            opens, clicks = self.events["open"], self.events["click"]
+            return {
+                "opens": opens.total,
+                "clicks": clicks.total,
+                "unique_opens": len(opens.by_email),
+                "unique_clicks": len(clicks.by_email),
+            }
+
+    def query(self, event_type, since=None, until=None, cursor=None, limit=100):
+        # Raw events in [since, until] (see parse_time_bound), `limit` at a
+        # time. Pass the returned `next_cursor` back to continue. Appends from
+        # several processes aren't strictly time-ordered, so the hour offsets
+        # only give a safe place to start; every event is checked against
+        # both bounds.
+        self.refresh()
+        with self._lock:
+            agg = self.events[event_type]
+            end = agg.offset
+            if cursor is not None:
+                start = int(cursor)
+            elif since:
+                later = [o for h, o in agg.hour_offsets.items() if h >= _hour(since)]
+                start = min(later) if later else end
+            else:
+                start = 0
+        events, next_cursor = [], None
+        path = event_path(self.campaign, event_type)
+        if start < end and os.path.exists(path):
+            with open(path, "rb") as f:
+                f.seek(start)
+                position = start
+                for line in f:
+                    if position >= end:
+                        break
+                    position += len(line)
+                    try:
+                        event = json.loads(line)
+                        ts = event["timestamp"]
+                    except (ValueError, KeyError, TypeError):
+                        continue  # counted by catch_up
+                    if (since and ts < since) or (until and ts > until):
+                        continue
+                    events.append(event)
+                    if len(events) >= limit:
+                        next_cursor = position if position < end else None
+                        break
+        return {
+            "campaign": self.campaign,
+            "event": event_type,
+            "events": events,
+            "next_cursor": next_cursor,
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_campaign_stats(campaign):
+    with _stats_lock:
+        stats = _stats.get(campaign)
+        if stats is None:
+            stats = _stats[campaign] = CampaignStats(campaign)
+    return stats
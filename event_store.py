@@ -0,0 +1,193 @@
+# event_store.py — Buffered, append-only storage for open/click events
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import defaultdict
+import metrics
+from file_lock import locked
+
+TRACK_LOG_DIR = "logs/tracking"
+os.makedirs(TRACK_LOG_DIR, exist_ok=True)
+
+FLUSH_INTERVAL = 0.25   # seconds between background flushes
+FLUSH_BATCH = 1000      # flush early once this many events are pending
+FLUSH_RETRIES = 20      # failed flushes in a row (~5s) before a file's events are dead-lettered
+DEAD_LETTER_PATH = os.path.join(TRACK_LOG_DIR, "dead_letter.jsonl")
+
+FLUSH_SECONDS = metrics.histogram("event_flush_seconds", "Time to append one batch of buffered events")
+EVENTS_WRITTEN = metrics.counter("events_written_total", "Tracking events appended to disk")
+EVENTS_DEAD = metrics.counter("events_dead_lettered_total", "Tracking events that could not be written to their file")
+
+
+def safe_name(name):
+    return name.replace("/", "_").replace("\\", "_").replace("..", "_")
+
+
+def event_path(campaign, event_type):
+    return os.path.join(TRACK_LOG_DIR, f"{safe_name(campaign)}_{event_type}.jsonl")
+
+
+def legacy_path(campaign, event_type):
+    return os.path.join(TRACK_LOG_DIR, f"{safe_name(campaign)}_{event_type}.json")
+
+
+# --- Migration from the old one-JSON-array-per-file format ---
+_migrated = set()
+
+
+def migrate_legacy(campaign, event_type):
+    path = event_path(campaign, event_type)
+    if path in _migrated:
+        return
+    old = legacy_path(campaign, event_type)
+    if os.path.exists(old):
+        with locked(path):
+            if os.path.exists(old):
+                with open(old) as f:
+                    events = json.load(f)
+                tmp = path + ".tmp"
+                with open(tmp, "w") as out:
+                    for event in events:
+                        out.write(json.dumps(event) + "\n")
+                    if os.path.exists(path):  # events appended before migration
+                        with open(path) as current:
+                            out.write(current.read())
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp, path)
+                os.replace(old, old + ".migrated")
+    _migrated.add(path)
+
+
+# --- Writer ---
+class EventWriter:
+    # record() only enqueues; a background thread groups pending events by
+    # file and writes each group with one O_APPEND write. A group that fails
+    # is retried on later flushes without holding up the others; after
+    # FLUSH_RETRIES failures in a row its events go to the dead-letter file.
+
+    def __init__(self):
+        self._pending = []
+        self._failures = {}  # (campaign, event_type) -> consecutive failed flushes
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # (Re)start after fork, e.g. under a pre-forking WSGI server
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+            self._thread.start()
+
+    def record(self, campaign, event_type, entry):
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._pending.append((campaign, event_type, line))
+            count = len(self._pending)
+            self._ensure_thread()
+        if count >= FLUSH_BATCH:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logging.exception("Event flush failed")
+                time.sleep(FLUSH_INTERVAL)
+
+    def flush(self):
+        # Returns how many events were written
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        groups = defaultdict(list)
+        for campaign, event_type, line in pending:
+            groups[(campaign, event_type)].append(line)
+        written, retry = 0, []
+        with FLUSH_SECONDS.time():
+            for (campaign, event_type), lines in groups.items():
+                key = (campaign, event_type)
+                try:
+                    _append(campaign, event_type, lines)
+                except Exception:
+                    failures = self._failures[key] = self._failures.get(key, 0) + 1
+                    if failures < FLUSH_RETRIES:
+                        logging.exception(
+                            f"Writing {event_type} events for '{campaign}' failed ({failures}/{FLUSH_RETRIES})"
+                        )
+                        retry.extend((campaign, event_type, line) for line in lines)
+                    else:
+                        logging.exception(
+                            f"Writing {event_type} events for '{campaign}' keeps failing; "
+                            f"moving {len(lines)} to {DEAD_LETTER_PATH}"
+                        )
+                        del self._failures[key]
+                        _dead_letter(campaign, event_type, lines)
+                        EVENTS_DEAD.inc(len(lines))
+                else:
+                    self._failures.pop(key, None)
+                    written += len(lines)
+        if retry:
+            # Back at the front, ahead of newer events
+            with self._lock:
+                self._pending[:0] = retry
+        EVENTS_WRITTEN.inc(written)
+        return written
+
+
+def _append(campaign, event_type, lines):
+    migrate_legacy(campaign, event_type)
+    path = event_path(campaign, event_type)
+    data = "".join(lines).encode()
+    with locked(path):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+def _dead_letter(campaign, event_type, lines):
+    records = "".join(
+        json.dumps({"campaign": campaign, "event_type": event_type, "event": line.rstrip("\n")}) + "\n"
+        for line in lines
+    )
+    try:
+        with locked(DEAD_LETTER_PATH), open(DEAD_LETTER_PATH, "a") as f:
+            f.write(records)
+    except OSError:
+        logging.exception(f"Dropping {len(lines)} {event_type} events for '{campaign}'")
+
+
+writer = EventWriter()
+atexit.register(writer.flush)
+
+
+def record_event(campaign, event_type, entry):
+    writer.record(campaign, event_type, entry)
+
+
+# --- Reader ---
+def iter_events(campaign, event_type):
+    migrate_legacy(campaign, event_type)
+    path = event_path(campaign, event_type)
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        for line in f:
+            if line.endswith(b"\n"):
+                yield json.loads(line)
+
+
+def load_events(campaign, event_type):
+    return list(iter_events(campaign, event_type))
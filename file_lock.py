@@ -0,0 +1,33 @@
+# file_lock.py — Cross-process lock on a sidecar file, shared by the file-backed stores
+
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+
+class locked:
+    # `with locked(path):` holds an exclusive flock on path + ".lock". With
+    # blocking=False it returns at once; check `.acquired` to see if it got it.
+
+    def __init__(self, path, blocking=True):
+        self.path = path + ".lock"
+        self.blocking = blocking
+        self.acquired = False
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | (0 if self.blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return self
+        self.acquired = True
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl and self.acquired:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
@@ -0,0 +1,283 @@
+# followup_scheduler.py — Durable timer heap for delayed follow-up sends
+
+import os
+import json
+import time
+import heapq
+import uuid
+import logging
+import threading
+from email.utils import parseaddr
+from email_extract import normalize_email
+from file_lock import locked
+
+SCHEDULE_DIR = "logs/followups"
+JOURNAL_PATH = os.path.join(SCHEDULE_DIR, "journal.jsonl")
+os.makedirs(SCHEDULE_DIR, exist_ok=True)
+
+DUE_BATCH = 500          # jobs handed to the send engine at a time
+COMPACT_MIN_DEAD = 10_000
+
+
+def followup_campaign(campaign, step=1):
+    # Each follow-up step gets its own ledger, so neither the first send nor
+    # an earlier follow-up marks it a duplicate
+    return f"{campaign}.followup" if step == 1 else f"{campaign}.followup{step}"
+
+
+class FollowUpScheduler:
+    # Every change is a line in an append-only journal: "add" (the whole job),
+    # "cancel" and "done" (lists of job ids). Replaying it rebuilds `jobs`,
+    # a min-heap of (due, id) and an email -> job ids index; other processes'
+    # appends are picked up by tailing from `offset`. Cancelled and finished
+    # jobs stay in the heap and are skipped when they surface, so scheduling
+    # and cancelling are O(log n) / O(1) and nothing is ever re-heapified.
+    # compact() rewrites the journal with only the pending jobs.
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self.jobs = {}
+        self.heap = []
+        self.by_email = {}
+        self.dead = 0
+        self.offset = 0
+        self._inode = None
+        with self._lock, locked(self.path):
+            self._catch_up()
+
+    # --- Journal replay ---
+    def _apply(self, record):
+        op = record["op"]
+        if op == "add":
+            job = record["job"]
+            self.jobs[job["id"]] = job
+            heapq.heappush(self.heap, (job["due"], job["id"]))
+            self.by_email.setdefault(normalize_email(job["email"]), set()).add(job["id"])
+            return
+        for job_id in record["ids"]:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                continue
+            key = normalize_email(job["email"])
+            ids = self.by_email.get(key)
+            if ids is not None:
+                ids.discard(job_id)
+                if not ids:
+                    del self.by_email[key]
+            self.dead += 1
+
+    def _catch_up(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._inode is not None and st.st_ino != self._inode:
+            # Compacted by another process: replay the new file
+            self.jobs, self.heap, self.by_email, self.dead, self.offset = {}, [], {}, 0, 0
+        self._inode = st.st_ino
+        if st.st_size == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial write in progress elsewhere
+                self.offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(record)
+
+    def _append(self, records):
+        data = "".join(json.dumps(r) + "\n" for r in records).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+            self._inode = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        self.offset += len(data)
+        for record in records:
+            self._apply(record)
+
+    def refresh(self):
+        with self._lock, locked(self.path):
+            self._catch_up()
+
+    # --- Scheduling ---
+    def schedule(self, jobs):
+        # `jobs` are dicts with email, subject, body, campaign, optionally
+        # step (1 for the first follow-up, 2 for the next, ...) and either
+        # "due" (epoch seconds) or "delay" (seconds from now). Returns ids.
+        now = time.time()
+        records = []
+        for job in jobs:
+            job = {
+                "id": uuid.uuid4().hex,
+                "due": float(job["due"]) if "due" in job else now + float(job.get("delay", 0)),
+                "email": job["email"],
+                "campaign": str(job.get("campaign")),
+                "step": int(job.get("step", 1)),
+                "subject": job["subject"],
+                "body": job["body"],
+            }
+            records.append({"op": "add", "job": job})
+        with self._lock, locked(self.path):
+            self._catch_up()
+            self._append(records)
+        return [r["job"]["id"] for r in records]
+
+    def cancel(self, job_ids):
+        with self._lock, locked(self.path):
+            self._catch_up()
+            live = [i for i in job_ids if i in self.jobs]
+            if live:
+                self._append([{"op": "cancel", "ids": live}])
+            return len(live)
+
+    def cancel_for(self, emails):
+        # Drop every pending follow-up to these addresses (any campaign)
+        with self._lock, locked(self.path):
+            self._catch_up()
+            live = []
+            for email in emails:
+                live.extend(self.by_email.get(normalize_email(email), ()))
+            if live:
+                self._append([{"op": "cancel", "ids": live}])
+            return len(live)
+
+    def complete(self, job_ids):
+        with self._lock, locked(self.path):
+            self._catch_up()
+            live = [i for i in job_ids if i in self.jobs]
+            if live:
+                self._append([{"op": "done", "ids": live}])
+
+    # --- Due jobs ---
+    def take_due(self, now=None, limit=DUE_BATCH):
+        # Pops up to `limit` due jobs off the heap, earliest first: O(k log n).
+        # They stay pending in the journal until complete(); anything not
+        # completed goes back with release(). After a crash they are simply
+        # replayed (the follow-up ledger turns a repeat into a duplicate skip).
+        now = time.time() if now is None else now
+        with self._lock, locked(self.path):
+            self._catch_up()
+            batch = []
+            while self.heap and self.heap[0][0] <= now and len(batch) < limit:
+                _, job_id = heapq.heappop(self.heap)
+                job = self.jobs.get(job_id)
+                if job is not None:  # else cancelled or done
+                    batch.append(job)
+            return batch
+
+    def release(self, jobs):
+        with self._lock:
+            for job in jobs:
+                if job["id"] in self.jobs:
+                    heapq.heappush(self.heap, (job["due"], job["id"]))
+
+    def pending(self):
+        return len(self.jobs)
+
+    def next_due(self):
+        with self._lock:
+            while self.heap and self.heap[0][1] not in self.jobs:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def compact(self):
+        with self._lock, locked(self.path):
+            self._catch_up()
+            self._compact()
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for job in self.jobs.values():
+                f.write(json.dumps({"op": "add", "job": job}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        st = os.stat(self.path)
+        self.offset, self._inode, self.dead = st.st_size, st.st_ino, 0
+        self.heap = [(job["due"], job_id) for job_id, job in self.jobs.items()]
+        heapq.heapify(self.heap)
+
+    # --- Runner ---
+    def run_due(self, engine, limit=DUE_BATCH):
+        # Hands due jobs to `engine` (a SendEngine) a batch at a time until
+        # none are due or the daily quota runs out. Only one runner works the
+        # journal at a time; others return immediately.
+        totals = {"sent": 0, "failed": 0, "duplicates": 0, "suppressed": 0, "deferred": 0}
+        with locked(self.path + ".runner", blocking=False) as runner:
+            if not runner.acquired:
+                return totals
+            exhausted = False
+            retry = []  # unsettled jobs, kept off the heap until this run ends
+            try:
+                while not exhausted:
+                    batch = self.take_due(limit=limit)
+                    if not batch:
+                        break
+                    groups = {}
+                    for job in batch:
+                        groups.setdefault((job["campaign"], job.get("step", 1)), []).append(job)
+                    groups = list(groups.items())
+                    for i, ((campaign, step), jobs) in enumerate(groups):
+                        if exhausted:
+                            retry.extend(jobs)
+                            continue
+                        try:
+                            report = engine.send_batch(followup_campaign(campaign, step), jobs)
+                        except Exception:
+                            # Nothing unsent is lost: this group and the rest go
+                            # back on the heap (the ledger skips what did go out)
+                            for _, rest in groups[i:]:
+                                retry.extend(rest)
+                            raise
+                        for key in totals:
+                            totals[key] += report[key]
+                        # Only settled jobs are done: sent, failed for good (the
+                        # ledger never retries them) or suppressed. Deferred and
+                        # crashed sends have no ledger entry and are retried.
+                        exhausted = report["quota_exhausted"]
+                        settled = report["sent_emails"] | report["failed_emails"] | report["suppressed_emails"]
+                        self.complete([j["id"] for j in jobs if j["email"] in settled])
+                        retry.extend(j for j in jobs if j["email"] not in settled)
+            finally:
+                self.release(retry)
+            with self._lock, locked(self.path):
+                if self.dead >= COMPACT_MIN_DEAD and self.dead > len(self.jobs):
+                    self._compact()
+        if any(totals.values()):
+            logging.info(
+                f"⏰ Follow-ups: sent {totals['sent']}, failed {totals['failed']}, "
+                f"skipped {totals['duplicates'] + totals['suppressed']}, {self.pending()} pending"
+            )
+        return totals
+
+
+def reply_senders(replies):
+    # Normalized sender addresses of InboxSync reply records
+    senders = set()
+    for reply in replies:
+        address = parseaddr(reply.get("from", ""))[1]
+        if "@" in address:
+            senders.add(normalize_email(address))
+    return senders
+
+
+# --- Process-wide instance ---
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FollowUpScheduler()
+    return _scheduler
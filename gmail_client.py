@@ -0,0 +1,108 @@
+# gmail_client.py — Long-lived Gmail API client shared by senders and inbox sync
+
+import os
+import json
+import time
+import base64
+import threading
+from email.mime.text import MIMEText
+import httplib2
+import google_auth_httplib2
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+import metrics
+
+DISCOVERY_CACHE_DIR = "logs/cache"
+DISCOVERY_CACHE_PATH = os.path.join(DISCOVERY_CACHE_DIR, "gmail_v1_discovery.json")
+DISCOVERY_URL = "https://gmail.googleapis.com/$discovery/rest?version=v1"
+# Point GMAIL_API_ENDPOINT at a local stand-in (see benchmarks/fake_google.py)
+API_ENDPOINT = os.environ.get("GMAIL_API_ENDPOINT")
+os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+
+_discovery_doc = None
+_discovery_lock = threading.Lock()
+
+
+# Discovery document: memory -> local cache file -> bundled copy -> network
+def load_discovery_doc():
+    global _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is not None:
+            return _discovery_doc
+        if os.path.exists(DISCOVERY_CACHE_PATH):
+            with open(DISCOVERY_CACHE_PATH) as f:
+                _discovery_doc = json.load(f)
+            return _discovery_doc
+        content = discovery_cache.get_static_doc("gmail", "v1")
+        if content is None:
+            resp, content = httplib2.Http(timeout=30).request(DISCOVERY_URL)
+            if resp.status != 200:
+                raise RuntimeError(f"Could not fetch Gmail discovery document ({resp.status})")
+            content = content.decode()
+        tmp = DISCOVERY_CACHE_PATH + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(content)
+        os.replace(tmp, DISCOVERY_CACHE_PATH)
+        _discovery_doc = json.loads(content)
+        return _discovery_doc
+
+
+API_SECONDS = metrics.histogram("gmail_api_seconds", "Gmail API call latency", ("method",))
+API_ERRORS = metrics.counter("gmail_api_errors_total", "Gmail API calls that raised", ("method", "status"))
+
+
+class TimedHttpRequest(HttpRequest):
+    # Every API call made through the client's service objects is timed
+    # per method (e.g. gmail.users.messages.send)
+    def execute(self, *args, **kwargs):
+        method = self.methodId or "unknown"
+        start = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        except HttpError as e:
+            API_ERRORS.labels(method, str(e.resp.status)).inc()
+            raise
+        except Exception as e:
+            API_ERRORS.labels(method, type(e).__name__).inc()
+            raise
+        finally:
+            API_SECONDS.labels(method).observe(time.perf_counter() - start)
+
+
+# Base64url-encoded MIME message, as users.messages.send expects it
+def build_raw_message(to, subject, message_text):
+    message = MIMEText(message_text, "html")
+    message["to"] = to
+    message["subject"] = subject
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+
+class GmailClient:
+    # httplib2 connections are not thread-safe, so each thread gets its own
+    # keep-alive connection and service object; together they form the pool.
+    # AuthorizedHttp refreshes the access token before expiry and on 401.
+
+    def __init__(self, creds, timeout=30):
+        self.creds = creds
+        self.timeout = timeout
+        self._doc = load_discovery_doc()
+        if API_ENDPOINT:
+            # rootUrl also drives the batch endpoint, which client_options would miss
+            self._doc = dict(self._doc, rootUrl=API_ENDPOINT.rstrip("/") + "/")
+        self._local = threading.local()
+
+    @property
+    def service(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.creds, http=httplib2.Http(timeout=self.timeout)
+            )
+            service = build_from_document(self._doc, http=http, requestBuilder=TimedHttpRequest)
+            self._local.service = service
+        return service
+
+    def send_raw(self, raw):
+        return self.service.users().messages().send(userId="me", body={"raw": raw}).execute()
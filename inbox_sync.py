@@ -0,0 +1,151 @@
+# inbox_sync.py — Batched, history-based reply polling with a local cache
+
+import os
+import json
+import logging
+import threading
+from email.utils import getaddresses
+from googleapiclient.errors import HttpError
+from gmail_client import API_SECONDS
+from email_extract import normalize_email
+
+INBOX_DIR = "logs/inbox"
+INBOX_STATE_PATH = os.path.join(INBOX_DIR, "replies.json")
+os.makedirs(INBOX_DIR, exist_ok=True)
+
+BATCH_CHUNK = 50        # Gmail recommends <= 50 calls per batch request
+FETCH_ATTEMPTS = 2      # batch passes over ids whose metadata fetch failed
+MAX_CACHED_REPLIES = 5000
+
+
+class InboxSync:
+    # First poll lists the inbox once; afterwards only messages added since
+    # the stored historyId are requested, and only ids missing from the
+    # cache are fetched, in batch requests of BATCH_CHUNK.
+
+    def __init__(self, client, path=INBOX_STATE_PATH):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self.history_id = None
+        self.replies = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.history_id = state.get("history_id")
+            self.replies = state.get("replies", {})
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"history_id": self.history_id, "replies": self.replies}, f)
+        os.replace(tmp, self.path)
+
+    # --- Message ids to look at ---
+    def _full_ids(self, limit):
+        service = self.client.service
+        profile = service.users().getProfile(userId="me").execute()
+        results = service.users().messages().list(userId="me", q="is:inbox", maxResults=limit).execute()
+        self.history_id = profile.get("historyId")
+        return [m["id"] for m in results.get("messages", [])]
+
+    def _history_ids(self):
+        service = self.client.service
+        ids, page_token = [], None
+        try:
+            while True:
+                resp = service.users().history().list(
+                    userId="me",
+                    startHistoryId=self.history_id,
+                    historyTypes=["messageAdded"],
+                    labelId="INBOX",
+                    pageToken=page_token,
+                ).execute()
+                for record in resp.get("history", []):
+                    for added in record.get("messagesAdded", []):
+                        ids.append(added["message"]["id"])
+                page_token = resp.get("nextPageToken")
+                if not page_token:
+                    self.history_id = resp.get("historyId", self.history_id)
+                    return ids
+        except HttpError as e:
+            if e.resp.status == 404:  # historyId too old: resync from scratch
+                return None
+            raise
+
+    # --- Batched metadata fetch ---
+    def _fetch_metadata(self, ids):
+        # Returns ({id: reply record}, ids that still failed after retrying).
+        # Messages deleted in the meantime (404) are neither.
+        service = self.client.service
+        fetched = {}
+        failed = []
+
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                if not (isinstance(exception, HttpError) and exception.resp.status == 404):
+                    failed.append(request_id)
+                return
+            headers = response.get("payload", {}).get("headers", [])
+            fetched[request_id] = {
+                "id": request_id,
+                "thread_id": response.get("threadId"),
+                "from": next((h["value"] for h in headers if h["name"] == "From"), "Unknown"),
+                "subject": next((h["value"] for h in headers if h["name"] == "Subject"), ""),
+                # Set by Gmail's mailer-daemon on bounce notifications
+                "failed_recipients": next((h["value"] for h in headers if h["name"] == "X-Failed-Recipients"), ""),
+                "snippet": response.get("snippet", ""),
+                "internal_date": int(response.get("internalDate", 0)),
+            }
+
+        for attempt in range(FETCH_ATTEMPTS):
+            if attempt:
+                ids, failed = failed, []
+            for start in range(0, len(ids), BATCH_CHUNK):
+                batch = service.new_batch_http_request(callback=on_response)
+                for msg_id in ids[start:start + BATCH_CHUNK]:
+                    batch.add(
+                        service.users().messages().get(
+                            userId="me", id=msg_id, format="metadata", metadataHeaders=["From", "Subject", "X-Failed-Recipients"]
+                        ),
+                        request_id=msg_id,
+                    )
+                with API_SECONDS.labels("batch").time():
+                    batch.execute()
+            if not failed:
+                break
+        return fetched, failed
+
+    # --- Public API ---
+    def poll(self, limit=20):
+        # Returns (latest `limit` cached replies, replies new in this poll)
+        with self._lock:
+            previous_history_id = self.history_id
+            ids = self._history_ids() if self.history_id else None
+            if ids is None:
+                ids = self._full_ids(limit)
+            missing = list(dict.fromkeys(i for i in ids if i not in self.replies))
+            new, failed = self._fetch_metadata(missing) if missing else ({}, [])
+            if failed:
+                # Keep the old historyId so the next poll lists these again
+                logging.warning(f"Could not fetch {len(failed)} message(s); retrying them on the next poll.")
+                self.history_id = previous_history_id
+            self.replies.update(new)
+            if len(self.replies) > MAX_CACHED_REPLIES:
+                keep = sorted(self.replies.values(), key=lambda r: r["internal_date"], reverse=True)
+                self.replies = {r["id"]: r for r in keep[:MAX_CACHED_REPLIES]}
+            if new or self.history_id != previous_history_id:
+                self._save()
+            latest = sorted(self.replies.values(), key=lambda r: r["internal_date"], reverse=True)
+            return latest[:limit], list(new.values())
+
+
+def bounced_recipients(replies):
+    # Normalized addresses that bounced, from the bounce notifications among
+    # InboxSync reply records
+    bounced = set()
+    for reply in replies:
+        for _, address in getaddresses([reply.get("failed_recipients", "")]):
+            if "@" in address:
+                bounced.add(normalize_email(address))
+    return bounced
@@ -0,0 +1,346 @@
+# metrics.py — In-process counters, latency histograms and a sampling profiler
+#
+# Metrics live in the process that records them: track_api serves its own at
+# /metrics (Prometheus text format), worker.py logs a periodic summary.
+# Recording is a dict lookup plus a locked add, cheap enough for the pixel
+# endpoint; the profiler costs nothing until it is started.
+
+import os
+import sys
+import time
+import logging
+import threading
+from functools import partial, wraps
+from bisect import bisect_left
+from collections import Counter as _Tally
+
+PREFIX = "ghostbot_"
+
+# Seconds; upper bounds of the histogram buckets (+Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROFILE_DIR = "logs/profile"
+
+
+# --- Metric types ---
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for bound, n in zip(self.bounds, counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    # Context manager and decorator observing elapsed seconds
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+    def __call__(self, fn):
+        child = self.child
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        return timed
+
+
+class _Family:
+    # A named metric with optional labels; each label-value tuple gets its
+    # own child, made by calling `new_child()`. Unlabelled families act as
+    # their single child.
+    kind = None
+
+    def __init__(self, name, help, labels, new_child):
+        self.name = PREFIX + name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.children = {}
+        self._new_child = new_child
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self._lock:
+                child = self.children.get(values)
+                if child is None:
+                    child = self.children[values] = self._new_child()
+        return child
+
+    def _label_text(self, values, extra=None):
+        pairs = list(zip(self.label_names, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels, _CounterChild)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        for values, child in list(self.children.items()):
+            yield f"{self.name}{self._label_text(values)} {child.value}"
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels, partial(_HistogramChild, self.buckets))
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return _Timer(self.labels())
+
+    def render(self):
+        for values, child in list(self.children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{self._label_text(values, ('le', le))} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(values)} {total}"
+            yield f"{self.name}_count{self._label_text(values)} {count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# --- Registry ---
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _register(cls, name, help, labels, **kwargs):
+    with _registry_lock:
+        family = _registry.get(PREFIX + name)
+        if family is None:
+            family = _registry[PREFIX + name] = cls(name, help, labels, **kwargs)
+        elif not isinstance(family, cls) or family.label_names != tuple(labels):
+            raise ValueError(f"Metric {name} is already registered with a different type or labels")
+    return family
+
+
+def counter(name, help, labels=()):
+    return _register(Counter, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+def render():
+    # Prometheus text exposition format (version 0.0.4)
+    lines = []
+    with _registry_lock:
+        families = sorted(_registry.values(), key=lambda f: f.name)
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    # One short line per series that has seen any activity
+    lines = []
+    with _registry_lock:
+        families = sorted(_registry.values(), key=lambda f: f.name)
+    for family in families:
+        for values, child in list(family.children.items()):
+            series = family.name[len(PREFIX):] + (f"[{','.join(map(str, values))}]" if values else "")
+            if isinstance(child, _CounterChild):
+                if child.value:
+                    lines.append(f"{series}={child.value}")
+            elif child.count:
+                p50, p99 = child.quantile(0.5), child.quantile(0.99)
+                lines.append(
+                    f"{series}: n={child.count} mean={child.sum / child.count * 1000:.1f}ms "
+                    f"p50<={p50 * 1000:g}ms p99<={p99 * 1000:g}ms"
+                )
+    return lines
+
+
+def start_reporter(interval=60, logger=None):
+    # Logs summary() every `interval` seconds from a daemon thread; set the
+    # returned event to stop it
+    logger = logger or logging.getLogger("metrics")
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            lines = summary()
+            if lines:
+                logger.info("📊 Metrics: " + "; ".join(lines))
+
+    threading.Thread(target=run, name="metrics-reporter", daemon=True).start()
+    return stop
+
+
+# --- Sampling profiler ---
+class SamplingProfiler:
+    # Every `interval` seconds, records the stack of each running thread
+    # (other than its own). Counts are kept as collapsed stacks,
+    # "outer;inner;leaf" -> samples, the input format of flamegraph tools.
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = _Tally()
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                with self._lock:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self, limit=None):
+        with self._lock:
+            top = self.samples.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in top)
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+
+_profiler = SamplingProfiler(interval=float(os.environ.get("PROFILE_INTERVAL", 0.005)))
+
+
+def get_profiler():
+    return _profiler
+
+
+def start_profiler():
+    _profiler.reset()
+    _profiler.start()
+
+
+def stop_profiler():
+    # Stops sampling and writes the collapsed stacks to logs/profile; returns the path
+    _profiler.stop()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+    with open(path, "w") as f:
+        f.write(_profiler.collapsed())
+    return path
+
+
+def install_profiler_signal(signum=None):
+    # Lets a running process be profiled on demand: `kill -USR2 <pid>`
+    # starts sampling, the next one stops it and writes the report
+    import signal
+    signum = signum or getattr(signal, "SIGUSR2", None)
+    if signum is None:  # Windows
+        return False
+
+    def toggle(*_):
+        if _profiler.running:
+            logging.info(f"🔬 Profile written to {stop_profiler()}")
+        else:
+            start_profiler()
+            logging.info("🔬 Sampling profiler started")
+
+    signal.signal(signum, toggle)
+    return True
+
+
+if os.environ.get("PROFILE_ON_START"):
+    start_profiler()
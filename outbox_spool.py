@@ -0,0 +1,112 @@
+# outbox_spool.py — Pre-rendered, ready-to-send payloads for one campaign batch
+
+import os
+import re
+import json
+import atexit
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from gmail_client import build_raw_message
+
+SPOOL_DIR = "logs/spool"
+os.makedirs(SPOOL_DIR, exist_ok=True)
+
+CHUNK_SIZE = 250   # messages per process-pool task
+# Would break the one-recipient-per-line spool format (and the To: header)
+CONTROL_CHARS_RE = re.compile(r"[\x00-\x1f\x7f]")
+SPOOL_PROCESSES = int(os.environ.get("SPOOL_PROCESSES", os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # One pool per process, reused across batches so fork cost is paid once
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=SPOOL_PROCESSES)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def spool_path(campaign, batch_number):
+    return os.path.join(SPOOL_DIR, f"{campaign}_batch{batch_number}.spool")
+
+
+def invalid_address(email):
+    return bool(CONTROL_CHARS_RE.search(str(email)))
+
+
+def _spool_key(recipients):
+    # Digest of exactly what the spool would contain, in order
+    digest = hashlib.sha256()
+    for recipient in recipients:
+        digest.update(json.dumps(recipient).encode())
+    return digest.hexdigest()
+
+
+def _header(path):
+    try:
+        with open(path) as f:
+            return json.loads(f.readline())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _render_chunk(chunk):
+    return [(email, build_raw_message(email, subject, body)) for email, subject, body in chunk]
+
+
+def build_spool(campaign, batch_number, recipients):
+    # `recipients` is a list of (email, subject, body). The spool is written
+    # to a temp file and renamed into place, so a spool that exists is
+    # complete. An existing spool is reused when resuming a batch only if it
+    # was built from the same recipients and rendered text; otherwise (the
+    # campaign was re-uploaded, or {date} moved on) it is rebuilt.
+    path = spool_path(campaign, batch_number)
+    key = _spool_key(recipients)
+    header = _header(path)
+    if header is not None and header.get("key") == key:
+        return path
+    bad = [email for email, _, _ in recipients if invalid_address(email)]
+    if bad:
+        raise ValueError(f"{len(bad)} address(es) in {campaign} batch {batch_number} contain control characters")
+    chunks = [recipients[i:i + CHUNK_SIZE] for i in range(0, len(recipients), CHUNK_SIZE)]
+    if len(chunks) > 1 and SPOOL_PROCESSES > 1:
+        rendered = _get_pool().map(_render_chunk, chunks)
+    else:
+        rendered = map(_render_chunk, chunks)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(json.dumps({"campaign": campaign, "batch": batch_number, "count": len(recipients), "key": key}) + "\n")
+        for chunk in rendered:
+            for email, raw in chunk:
+                f.write(f"{email}\t{raw}\n")  # neither contains tabs or newlines
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def iter_spool(campaign, batch_number):
+    # Yields {"email", "raw"} records for SendEngine.send_batch; recipients
+    # the ledger already has are skipped there, which makes replays safe
+    path = spool_path(campaign, batch_number)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header["campaign"] != campaign or header["batch"] != batch_number:
+            raise ValueError(f"Spool {path} belongs to {header['campaign']} batch {header['batch']}")
+        for line in f:
+            email, raw = line.rstrip("\n").split("\t", 1)
+            yield {"email": email, "raw": raw}
+
+
+def remove_spool(campaign, batch_number):
+    path = spool_path(campaign, batch_number)
+    if os.path.exists(path):
+        os.remove(path)
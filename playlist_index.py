@@ -0,0 +1,87 @@
+# playlist_index.py — Query engine over one playlist snapshot
+
+import re
+from bisect import bisect_left
+from collections import defaultdict
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+TEXT_COLUMNS = ("playlist_name", "bio", "curator")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class PlaylistIndex:
+    # Built once per snapshot. Queries combine boolean masks from postings
+    # and walk a presorted ordering, so the table is never copied or sorted
+    # again; results are row positions into `df`.
+
+    def __init__(self, df):
+        self.df = df
+        self.size = len(df)
+        self.genre_postings = self._postings(df["genre"])
+        self.platform_postings = self._postings(df["platform"])
+        self.genres = sorted(self.genre_postings)
+        self.platforms = sorted(self.platform_postings)
+
+        self.followers = df["followers"].to_numpy(dtype="float64")
+        names = df["playlist_name"].fillna("").astype(str).to_numpy()
+        # Missing names sort last, as sort_values(na_position="last") did
+        missing = df["playlist_name"].isna().to_numpy()
+        self.order_by_name = np.lexsort((names, missing))
+        self.order_by_followers = np.argsort(self.followers, kind="stable")
+
+        postings = defaultdict(set)
+        for col in TEXT_COLUMNS:
+            for row, text in enumerate(df[col].fillna("").astype(str)):
+                for token in tokenize(text):
+                    postings[token].add(row)
+        self.vocabulary = sorted(postings)
+        self.text_postings = {t: np.fromiter(rows, dtype=np.int64) for t, rows in postings.items()}
+
+    def _postings(self, column):
+        column = column.astype("category")
+        codes = column.cat.codes.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(column.cat.categories) + 1))
+        return {
+            value: order[bounds[i]:bounds[i + 1]]
+            for i, value in enumerate(column.cat.categories)
+            if bounds[i] < bounds[i + 1]
+        }
+
+    def _mask(self, positions):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _token_rows(self, prefix):
+        # Every query token matches as a prefix ("hip" finds "hiphop")
+        start = bisect_left(self.vocabulary, prefix)
+        rows = []
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            rows.append(self.text_postings[token])
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def query(self, genre=None, platform=None, min_followers=None, max_followers=None,
+              text=None, sort="name", descending=False):
+        mask = np.ones(self.size, dtype=bool)
+        if genre:
+            mask &= self._mask(self.genre_postings.get(genre, []))
+        if platform:
+            mask &= self._mask(self.platform_postings.get(platform, []))
+        if min_followers is not None:
+            mask &= self.followers >= min_followers
+        if max_followers is not None:
+            mask &= self.followers <= max_followers
+        for token in tokenize(text or ""):
+            mask &= self._mask(self._token_rows(token))
+
+        order = self.order_by_followers if sort == "followers" else self.order_by_name
+        if descending:
+            order = order[::-1]
+        return order[mask[order]]
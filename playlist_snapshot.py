@@ -0,0 +1,108 @@
+# playlist_snapshot.py — Cleaned, columnar snapshot of the playlist curator CSV
+
+import os
+import json
+import hashlib
+import pandas as pd
+from pyarrow import feather
+from email_extract import first_email
+
+CSV_FILE = "Updated_Playlist_Data__with_extracted_emails_.csv"
+SNAPSHOT_DIR = "logs/cache"
+SNAPSHOT_PATH = os.path.join(SNAPSHOT_DIR, "playlists.feather")
+SNAPSHOT_META_PATH = os.path.join(SNAPSHOT_DIR, "playlists.meta.json")
+os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+REQUIRED_COLS = [
+    "playlist_name", "email", "followers", "genre", "curator",
+    "social_link", "bio", "platform", "url"
+]
+
+# Bump when the snapshot layout changes so existing snapshots are rebuilt
+SNAPSHOT_VERSION = 3
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_meta():
+    if os.path.exists(SNAPSHOT_META_PATH) and os.path.exists(SNAPSHOT_PATH):
+        with open(SNAPSHOT_META_PATH) as f:
+            meta = json.load(f)
+        if meta.get("version") == SNAPSHOT_VERSION:
+            return meta
+    return None
+
+
+def _write_meta(meta):
+    tmp = SNAPSHOT_META_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, SNAPSHOT_META_PATH)
+
+
+# --- Cleaning (all column-wise, no per-row Python) ---
+def clean_playlists(df):
+    df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+    for col in REQUIRED_COLS:
+        if col not in df.columns:
+            df[col] = ""
+
+    # Normalized address from the email column, else the first one in curator
+    email = first_email(df["email"]).fillna(first_email(df["curator"]))
+    df["email"] = email.fillna("").astype(str)
+    df = df[df["email"].str.contains("@", regex=False)].copy()
+
+    df["genre"] = df["genre"].astype(str).str.strip().str.title().astype("category")
+    df["platform"] = df["platform"].astype(str).str.strip().str.title().astype("category")
+    df["followers"] = pd.to_numeric(df["followers"], errors="coerce").fillna(0)
+    df = df.drop_duplicates(subset="email").reset_index(drop=True)
+    # Stable id per curator (survives re-sorting, filtering and re-uploads)
+    df["curator_id"] = [hashlib.sha1(e.strip().lower().encode()).hexdigest()[:12] for e in df["email"]]
+    return df
+
+
+# --- Build / freshness ---
+def build_snapshot(csv_path=CSV_FILE):
+    st = os.stat(csv_path)
+    df = clean_playlists(pd.read_csv(csv_path))
+    tmp = SNAPSHOT_PATH + ".tmp"
+    df.to_feather(tmp, compression="uncompressed")  # uncompressed so it can be memory-mapped
+    os.replace(tmp, SNAPSHOT_PATH)
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "sha256": _file_hash(csv_path),
+        "rows": len(df),
+    }
+    _write_meta(meta)
+    return meta
+
+
+def ensure_snapshot(csv_path=CSV_FILE):
+    # Returns a cache key for callers (source hash + snapshot version), or
+    # None if there is no CSV. Only a stat() when nothing changed; the file is hashed only
+    # when mtime/size moved, and rebuilt only when the content differs.
+    if not os.path.exists(csv_path):
+        return None
+    st = os.stat(csv_path)
+    meta = _read_meta()
+    if not (meta and meta["mtime"] == st.st_mtime and meta["size"] == st.st_size):
+        if meta and meta["size"] == st.st_size and meta["sha256"] == _file_hash(csv_path):
+            meta["mtime"] = st.st_mtime
+            _write_meta(meta)
+        else:
+            meta = build_snapshot(csv_path)
+    return f"{meta['sha256']}-v{SNAPSHOT_VERSION}"
+
+
+def load_snapshot():
+    if not os.path.exists(SNAPSHOT_PATH):
+        return pd.DataFrame(columns=REQUIRED_COLS + ["curator_id"])
+    return feather.read_table(SNAPSHOT_PATH, memory_map=True).to_pandas()
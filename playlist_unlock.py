@@ -1,84 +1,61 @@
 import streamlit as st
 import pandas as pd
-import os
-import re
-from google.cloud import firestore
-import json
+from playlist_snapshot import CSV_FILE, REQUIRED_COLS, ensure_snapshot, build_snapshot, load_snapshot
+from playlist_index import PlaylistIndex
+from unlock_store import get_unlock_store
+
+PAGE_SIZES = [10, 20, 50, 100]
 
 # --- 🔐 Temporary Simple Login ---
-st.sidebar.title("🔐 Login")
-email = st.sidebar.text_input("Email")
-password = st.sidebar.text_input("Password", type="password")
-
-if "user_email" not in st.session_state:
-    st.session_state.user_email = None
-
-if st.sidebar.button("Login"):
-    if email == "ghost@example.com" and password == "Ghost123":
-        st.session_state.user_email = email
-        st.sidebar.success("✅ Logged in successfully")
-    else:
-        st.sidebar.error("❌ Invalid credentials")
+# Runs when the page is shown (not at import); stops the script until logged in
+def require_login():
+    st.sidebar.title("🔐 Login")
+    email = st.sidebar.text_input("Email")
+    password = st.sidebar.text_input("Password", type="password")
+
+    if "user_email" not in st.session_state:
+        st.session_state.user_email = None
+
+    if st.sidebar.button("Login"):
+        if email == "ghost@example.com" and password == "Ghost123":
+            st.session_state.user_email = email
+            st.sidebar.success("✅ Logged in successfully")
+        else:
+            st.sidebar.error("❌ Invalid credentials")
+            st.stop()
+
+    if not st.session_state.user_email:
+        st.warning("🔒 Please log in to access the app.")
         st.stop()
+    return st.session_state.user_email
+
+def unlock_log_path(user_email):
+    return f"unlocked_{user_email.replace('@', '_at_')}.csv"
+
+# One shared, read-only frame per source-file hash; the snapshot on disk is
+# rebuilt only when the CSV changes
+@st.cache_resource(max_entries=2)
+def load_data(source_hash=None):
+    if source_hash is None:
+        return pd.DataFrame(columns=REQUIRED_COLS + ["curator_id"])
+    return load_snapshot()
+
+# Postings, presorted orders and text index, built once per snapshot
+@st.cache_resource(max_entries=2)
+def load_index(source_hash=None):
+    return PlaylistIndex(load_data(source_hash))
 
-if not st.session_state.user_email:
-    st.warning("🔒 Please log in to access the app.")
-    st.stop()
-
-user_email = st.session_state.user_email
-is_admin = user_email == "admin@email.com"
-
-CSV_FILE = "Updated_Playlist_Data__with_extracted_emails_.csv"
-UNLOCK_LOG = f"unlocked_{user_email.replace('@', '_at_')}.csv"
-
-@st.cache_data
-def load_data():
-    def extract_email(text):
-        if pd.isna(text):
-            return ""
-        match = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\\.[a-zA-Z0-9-.]+", str(text))
-        return match.group(0) if match else ""
-
-    if os.path.exists(CSV_FILE):
-        df = pd.read_csv(CSV_FILE)
-        df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
-
-        required_cols = [
-            "playlist_name", "email", "followers", "genre", "curator",
-            "social_link", "bio", "platform", "url"
-        ]
-        for col in required_cols:
-            if col not in df.columns:
-                df[col] = ""
-
-        df["email"] = df["email"].fillna("").astype(str)
-        df["email"] = df.apply(
-            lambda row: row["email"] if "@" in row["email"] else extract_email(row.get("curator", "")),
-            axis=1
-        )
-        df = df[df["email"].str.contains("@")]
-        df["genre"] = df["genre"].astype(str).str.strip().str.title()
-        df["platform"] = df["platform"].astype(str).str.strip().str.title()
-        df["followers"] = pd.to_numeric(df["followers"], errors="coerce").fillna(0)
-        df.drop_duplicates(subset="email", inplace=True)
-        return df
-    else:
-        return pd.DataFrame(columns=[
-            "playlist_name", "email", "followers", "genre", "curator",
-            "social_link", "bio", "platform", "url"
-        ])
-
-def save_unlocked(df):
-    if os.path.exists(UNLOCK_LOG):
-        existing = pd.read_csv(UNLOCK_LOG)
-        df = pd.concat([existing, df], ignore_index=True).drop_duplicates(subset=["email"])
-    df.to_csv(UNLOCK_LOG, index=False)
-
-def run_playlist_unlock():
+def save_unlocked(df, unlock_log):
+    return get_unlock_store(unlock_log).add(row for _, row in df.iterrows())
+
+def run_playlist_unlock(user_email=None):
+    unlock_log = unlock_log_path(user_email or require_login())
     st.set_page_config("🔓 Unlock Playlist Contacts", layout="wide")
     st.title("🔓 Unlock Playlist Contacts")
 
-    df = load_data()
+    source_hash = ensure_snapshot()
+    df = load_data(source_hash)
+    index = load_index(source_hash)
 
     if "unlock_credits" not in st.session_state:
         st.session_state.unlock_credits = 10
@@ -90,39 +67,71 @@ def run_playlist_unlock():
 
     col1, col2, col3 = st.columns(3)
     with col1:
-        genre_filter = st.selectbox("🎵 Filter by Genre", ["All"] + sorted(df["genre"].dropna().unique()))
+        genre_filter = st.selectbox("🎵 Filter by Genre", ["All"] + index.genres)
     with col2:
-        platform_filter = st.selectbox("💽 Platform", ["All"] + sorted(df["platform"].dropna().unique()))
+        platform_filter = st.selectbox("💽 Platform", ["All"] + index.platforms)
     with col3:
         sort_order = st.selectbox("⬇️ Sort by", ["Playlist Name", "Followers (Low → High)", "Followers (High → Low)"])
 
-    filtered = df.copy()
-    if genre_filter != "All":
-        filtered = filtered[filtered["genre"] == genre_filter]
-    if platform_filter != "All":
-        filtered = filtered[filtered["platform"] == platform_filter]
-
-    if sort_order == "Playlist Name":
-        filtered = filtered.sort_values(by="playlist_name")
-    elif sort_order == "Followers (Low → High)":
-        filtered = filtered.sort_values(by="followers")
-    else:
-        filtered = filtered.sort_values(by="followers", ascending=False)
+    col4, col5, col6 = st.columns(3)
+    with col4:
+        search = st.text_input("🔎 Search name, bio or curator")
+    with col5:
+        min_followers = st.number_input("👥 Min followers", min_value=0, value=0, step=1000)
+    with col6:
+        max_followers = st.number_input("👥 Max followers (0 = any)", min_value=0, value=0, step=1000)
+
+    positions = index.query(
+        genre=None if genre_filter == "All" else genre_filter,
+        platform=None if platform_filter == "All" else platform_filter,
+        min_followers=min_followers or None,
+        max_followers=max_followers or None,
+        text=search,
+        sort="name" if sort_order == "Playlist Name" else "followers",
+        descending=sort_order == "Followers (High → Low)",
+    )
+
+    # --- Paging: only the visible slice is rendered ---
+    total = len(positions)
+    filters = (genre_filter, platform_filter, sort_order, search, min_followers, max_followers)
+    if st.session_state.get("unlock_filters") != filters:
+        st.session_state.unlock_filters = filters
+        st.session_state.unlock_page = 1
+
+    colP1, colP2 = st.columns(2)
+    with colP1:
+        page_size = st.selectbox("📄 Results per page", PAGE_SIZES, index=1)
+    pages = max(1, -(-total // page_size))
+    st.session_state.unlock_page = min(st.session_state.get("unlock_page", 1), pages)
+    with colP2:
+        page = st.number_input("Page", min_value=1, max_value=pages, key="unlock_page")
 
     st.markdown("### 📋 Playlist Curators")
+    st.caption(f"{total} matching curators · page {page} of {pages}")
+    visible = df.iloc[positions[(page - 1) * page_size:page * page_size]]
+
+    if "unlocked_ids" not in st.session_state:
+        st.session_state.unlocked_ids = set()
+    unlocked_ids = st.session_state.unlocked_ids
+    store = get_unlock_store(unlock_log)
+    store.refresh()
+
     colA, colB = st.columns(2)
     unlocked_records = []
 
-    for idx, row in filtered.iterrows():
+    for i, (_, row) in enumerate(visible.iterrows()):
+        cid = row["curator_id"]
+        if cid not in unlocked_ids and row["email"] in store:
+            unlocked_ids.add(cid)  # unlocked in an earlier session or another tab
         cost = 2 if row["followers"] and row["followers"] > 10000 else 1
-        section = colA if idx % 2 == 0 else colB
+        section = colA if i % 2 == 0 else colB
 
         with section:
             with st.container():
                 st.markdown(f"""
                 #### 🎧 {row['playlist_name'] or 'N/A'}
                 - 👤 **Curator**: {row.get('curator', 'N/A')}
-                - 📧 **Email**: {'🔒 Locked' if f"unlocked_{idx}" not in st.session_state else row['email']}
+                - 📧 **Email**: {'🔒 Locked' if cid not in unlocked_ids else row['email']}
                 - 🌐 **Followers**: {int(row['followers']) if pd.notna(row['followers']) else 'N/A'}
                 - 🏷️ **Genre**: {row.get('genre', 'N/A')}
                 - 💽 **Platform**: {row.get('platform', 'N/A')}
@@ -131,34 +140,36 @@ def run_playlist_unlock():
                 - 📝 **Bio**: {row.get('bio', 'N/A')}
                 """)
 
-                if f"unlocked_{idx}" not in st.session_state:
+                if cid not in unlocked_ids:
                     if st.session_state.unlock_credits >= cost:
-                        if st.button(f"Unlock (-{cost})", key=f"unlock_{idx}"):
-                            st.session_state[f"unlocked_{idx}"] = True
+                        if st.button(f"Unlock (-{cost})", key=f"unlock_{cid}"):
+                            unlocked_ids.add(cid)
                             st.session_state.unlock_credits -= cost
                             unlocked_records.append(row)
                     else:
-                        st.button("Out of credits", disabled=True, key=f"no_credit_{idx}")
+                        st.button("Out of credits", disabled=True, key=f"no_credit_{cid}")
                 else:
                     st.success("✅ Unlocked")
 
     if unlocked_records:
         new_unlocked_df = pd.DataFrame(unlocked_records)
-        save_unlocked(new_unlocked_df)
+        save_unlocked(new_unlocked_df, unlock_log)
 
-    if os.path.exists(UNLOCK_LOG):
+    if len(store):
         st.markdown("### 📬 Your Unlocked Emails")
-        unlocked_df = pd.read_csv(UNLOCK_LOG)
-        st.download_button("📥 Download Your Contacts", unlocked_df.to_csv(index=False), file_name="my_unlocked_contacts.csv")
+        st.caption(f"{len(store)} contacts unlocked")
+        # Deferred: the file is read only when the download is requested
+        st.download_button("📥 Download Your Contacts", store.export_bytes, file_name="my_unlocked_contacts.csv", mime="text/csv")
 
         if st.button("📤 Use These in Email Bot"):
-            st.session_state.selected_recipients = unlocked_df
+            st.session_state.selected_recipients = pd.read_csv(unlock_log)
             st.success("✅ Emails sent to email bot memory. You can now proceed to sending.")
 
 def send_email(email, playlist_name):
     print(f"📧 Sending email to {email} about playlist {playlist_name}")
 
-def admin_upload():
+def admin_upload(user_email):
+    is_admin = user_email == "admin@email.com"
     st.sidebar.markdown("### 🔧 Admin Upload")
     if not is_admin:
         st.sidebar.info("Only admins can upload new playlists.")
@@ -168,8 +179,10 @@ def admin_upload():
     if uploaded_file:
         df = pd.read_csv(uploaded_file)
         df.to_csv(CSV_FILE, index=False)
+        build_snapshot()
         st.sidebar.success("✅ Playlist database updated. Please refresh.")
 
 if __name__ == "__main__":
-    admin_upload()
-    run_playlist_unlock()
+    user_email = require_login()
+    admin_upload(user_email)
+    run_playlist_unlock(user_email)
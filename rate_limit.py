@@ -0,0 +1,176 @@
+# rate_limit.py — Token bucket + daily quota with adaptive backoff
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from file_lock import locked
+
+QUOTA_DIR = "logs/quota"
+os.makedirs(QUOTA_DIR, exist_ok=True)
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class TokenBucket:
+    # `rate` tokens per second, holding at most `burst` tokens
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+
+class SharedTokenBucket(TokenBucket):
+    # A TokenBucket whose state lives in a file, so every process (or host
+    # on a shared filesystem) drawing from the same `name` shares one rate.
+    # The rate is part of the state: a throttling slowdown seen by one
+    # worker slows them all. Processes sharing a bucket must agree on its
+    # configured rate; a changed configuration resets the shared state.
+
+    def __init__(self, name, rate, burst=None):
+        super().__init__(rate, burst)
+        self.ceiling = self.rate
+        self.path = os.path.join(QUOTA_DIR, f"{name}.bucket.json")
+
+    def _load(self, now):
+        state = _read_json(self.path, None)
+        if state is None or state.get("ceiling") != self.ceiling:
+            self.tokens, self.updated, self.rate = self.burst, now, self.ceiling
+        else:
+            self.tokens, self.updated, self.rate = state["tokens"], state["updated"], state["rate"]
+        self._refill(max(now, self.updated))
+
+    def _save(self):
+        _write_json(self.path, {
+            "tokens": self.tokens, "updated": self.updated, "rate": self.rate, "ceiling": self.ceiling,
+        })
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock, locked(self.path):
+                self._load(time.time())  # wall clock: comparable across hosts
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self._save()
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        with self._lock, locked(self.path):
+            self._load(time.time())
+            self.rate = float(rate)
+            self._save()
+
+
+class DailyQuota:
+    # Per-UTC-day counter, persisted so separate worker runs share the cap.
+    # Every change re-reads the file under a lock, so concurrent workers
+    # never lose each other's counts.
+    def __init__(self, name, per_day):
+        self.name = name
+        self.per_day = per_day
+        self._lock = threading.Lock()
+        self.day = None
+        self.used = 0
+
+    def _path(self, day):
+        return os.path.join(QUOTA_DIR, f"{self.name}_{day}.json")
+
+    def _roll(self):
+        self.day = datetime.utcnow().strftime("%Y-%m-%d")
+        self.used = _read_json(self._path(self.day), {"used": 0})["used"]
+
+    def _save(self):
+        _write_json(self._path(self.day), {"used": self.used})
+
+    def take(self):
+        with self._lock, locked(os.path.join(QUOTA_DIR, self.name)):
+            self._roll()
+            if self.per_day and self.used >= self.per_day:
+                return False
+            self.used += 1
+            self._save()
+            return True
+
+    def give_back(self):
+        with self._lock, locked(os.path.join(QUOTA_DIR, self.name)):
+            self._roll()
+            self.used = max(0, self.used - 1)
+            self._save()
+
+    def remaining(self):
+        with self._lock:
+            self._roll()
+            return max(0, self.per_day - self.used) if self.per_day else None
+
+
+class RateLimiter:
+    # Messages/sec via a token bucket and messages/day via DailyQuota. The
+    # rate halves on throttling responses and creeps back up on success
+    # (AIMD), never exceeding the configured ceiling. With shared=True the
+    # per-second rate is one budget for every process using `name` (see
+    # SharedTokenBucket); the daily quota always is.
+
+    def __init__(self, name, per_second, per_day=None, min_per_second=0.2, shared=False):
+        self.max_rate = float(per_second)
+        self.min_rate = min(float(min_per_second), self.max_rate)
+        self.bucket = SharedTokenBucket(name, per_second) if shared else TokenBucket(per_second)
+        self.quota = DailyQuota(name, per_day)
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    # One daily-quota slot per message, one token per API attempt
+    def reserve(self):
+        return self.quota.take()
+
+    def release(self):
+        self.quota.give_back()
+
+    def wait(self):
+        self.bucket.acquire()
+
+    def throttled(self):
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+
+    def succeeded(self):
+        if self.bucket.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.max_rate / 20))
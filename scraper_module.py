@@ -2,37 +2,165 @@
 
 import streamlit as st
 import pandas as pd
+import os
+import json
 import time
-from googleapiclient.discovery import build
+import hashlib
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rate_limit import TokenBucket
+import email_extract
 
-def google_search(query, api_key, cse_id, num_pages=3):
-    service = build("customsearch", "v1", developerKey=api_key)
+# Custom Search JSON API; point CSE_ENDPOINT at a local stand-in for tests
+SEARCH_ENDPOINT = os.environ.get("CSE_ENDPOINT", "https://www.googleapis.com/customsearch/v1")
+SEARCH_QPS = float(os.environ.get("CSE_QPS", 5))
+SEARCH_WORKERS = 4
+
+SEARCH_CACHE_DIR = "logs/cache/search"
+SEARCH_CACHE_TTL = 24 * 3600          # seconds
+SEARCH_CACHE_MAX_BYTES = 50 * 1024 * 1024
+SEARCH_CACHE_EVICT_EVERY = 100         # puts between directory scans
+os.makedirs(SEARCH_CACHE_DIR, exist_ok=True)
+
+_limiter = TokenBucket(SEARCH_QPS)
+
+
+# --- On-disk response cache keyed by (query, engine, page) ---
+class SearchCache:
+    def __init__(self, directory=SEARCH_CACHE_DIR, ttl=SEARCH_CACHE_TTL, max_bytes=SEARCH_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Eviction scans the whole directory, so it runs every
+        # SEARCH_CACHE_EVICT_EVERY puts or after a tenth of max_bytes is written
+        self._puts = 0
+        self._written = 0
+
+    def _path(self, query, cse_id, page):
+        key = hashlib.sha1(json.dumps([query, cse_id, page]).encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, query, cse_id, page):
+        path = self._path(query, cse_id, page)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, query, cse_id, page, items):
+        path = self._path(query, cse_id, page)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(items, f)
+            size = f.tell()
+        os.replace(tmp, path)
+        with self._lock:
+            self._puts += 1
+            self._written += size
+            due = self._puts >= SEARCH_CACHE_EVICT_EVERY or self._written >= self.max_bytes // 10
+            if due:
+                self._puts = self._written = 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        # Drop expired entries, then the oldest until under the size bound
+        with self._lock:
+            now = time.time()
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    st_ = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if now - st_.st_mtime > self.ttl:
+                    _remove(path)
+                else:
+                    entries.append((st_.st_mtime, st_.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                _remove(path)
+                total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:  # evicted by another process
+        pass
+
+
+search_cache = SearchCache()
+
+
+# --- Single page ---
+def fetch_page(query, api_key, cse_id, page, endpoint=None):
+    cached = search_cache.get(query, cse_id, page)
+    if cached is not None:
+        return cached
+    _limiter.acquire()
+    params = urllib.parse.urlencode({"q": query, "cx": cse_id, "key": api_key, "start": page * 10 + 1})
+    with urllib.request.urlopen(f"{endpoint or SEARCH_ENDPOINT}?{params}", timeout=30) as resp:
+        res = json.load(resp)
+    items = [
+        {"title": item.get("title"), "link": item.get("link"), "snippet": item.get("snippet")}
+        for item in res.get("items", [])
+    ]
+    search_cache.put(query, cse_id, page, items)
+    return items
+
+
+def google_search(query, api_key, cse_id, num_pages=3, endpoint=None):
+    # Pages are fetched concurrently (within the QPS limit); results keep page
+    # order and stop at the first failed page, as the sequential loop did
+    pages = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        futures = {pool.submit(fetch_page, query, api_key, cse_id, page, endpoint): page for page in range(num_pages)}
+        for future in as_completed(futures):
+            page = futures[future]
+            try:
+                pages[page] = future.result()
+            except Exception as e:
+                errors[page] = e
     results = []
     for page in range(num_pages):
-        start = page * 10 + 1
-        try:
-            res = service.cse().list(
-                q=query,
-                cx=cse_id,
-                start=start
-            ).execute()
-            for item in res.get("items", []):
-                results.append({
-                    "title": item.get("title"),
-                    "link": item.get("link"),
-                    "snippet": item.get("snippet"),
-                })
-            time.sleep(1)
-        except Exception as e:
-            st.warning(f"Error on '{query}' page {page + 1}: {e}")
+        if page in errors:
+            st.warning(f"Error on '{query}' page {page + 1}: {errors[page]}")
             break
+        results.extend(pages[page])
     return results
 
+
+def google_search_many(queries, api_key, cse_id, num_pages=3, endpoint=None):
+    # Fans out every (query, page) and yields (query, page, results) as each
+    # arrives; failed pages yield an Exception in place of results
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        futures = {
+            pool.submit(fetch_page, query, api_key, cse_id, page, endpoint): (query, page)
+            for query in queries
+            for page in range(num_pages)
+        }
+        for future in as_completed(futures):
+            query, page = futures[future]
+            try:
+                yield query, page, future.result()
+            except Exception as e:
+                yield query, page, e
+
+
 def extract_emails(results):
-    import re
-    emails = set()
-    for item in results:
-        text = f"{item['title']} {item['snippet']} {item['link']}"
-        found = re.findall(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", text)
-        emails.update(found)
-    return list(emails)
+    return email_extract.extract_emails(
+        f"{item['title']} {item['snippet']} {item['link']}" for item in results
+    )
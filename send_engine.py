@@ -0,0 +1,182 @@
+# send_engine.py — Concurrent, rate-limited batch sender
+
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from connect_gmail import get_gmail_client, build_raw_message, log_campaign_email, SEND_SECONDS, SENDS
+from send_ledger import get_ledger
+from suppression import get_suppression_list
+from rate_limit import RateLimiter
+import metrics
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+RETRIES = metrics.counter("send_retries_total", "Send attempts retried after a transient error", ("reason",))
+BATCH_SECONDS = metrics.histogram(
+    "send_batch_seconds", "SendEngine.send_batch duration",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+
+def _retry_after(error):
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class SendEngine:
+    # Sends through a bounded thread pool. Every attempt takes a token from
+    # the limiter; 429/5xx responses halve the send rate and retry with
+    # exponential backoff. Each recipient is written to the ledger exactly
+    # once, after its final outcome is known.
+
+    def __init__(self, creds=None, max_workers=4, per_second=2.0, per_day=2000,
+                 max_retries=5, backoff_base=1.0, limiter=None):
+        self.client = get_gmail_client(creds)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.limiter = limiter or RateLimiter("gmail_send", per_second, per_day)
+        self._stop = threading.Event()
+
+    def stop(self):
+        # Ends the batch in progress; the next send_batch starts afresh
+        self._stop.set()
+
+    # --- Single recipient ---
+    def _deliver(self, raw):
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            try:
+                self.client.send_raw(raw)
+                self.limiter.succeeded()
+                return None
+            except HttpError as e:
+                if e.resp.status not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    return str(e)
+                self.limiter.throttled()
+                RETRIES.labels(str(e.resp.status)).inc()
+                delay = _retry_after(e)
+            except (OSError, TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    return str(e)
+                RETRIES.labels(type(e).__name__).inc()
+                delay = None
+            except Exception as e:
+                return str(e)
+            if delay is None:
+                delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+            attempt += 1
+            time.sleep(delay)
+
+    def _send_one(self, campaign, item):
+        email = item["email"]
+        if not self.limiter.reserve():
+            SENDS.labels("engine", "deferred").inc()
+            return email, "deferred"
+        with SEND_SECONDS.labels("engine").time():
+            email, outcome = self._attempt(campaign, item)
+        SENDS.labels("engine", outcome).inc()
+        return email, outcome
+
+    def _attempt(self, campaign, item):
+        email = item["email"]
+        try:
+            raw = item.get("raw") or build_raw_message(email, item["subject"], item["body"])
+            error = self._deliver(raw)
+        except Exception as e:
+            error = str(e)
+        if error is None:
+            log_campaign_email(campaign, email, "success")
+            return email, "success"
+        self.limiter.release()
+        log_campaign_email(campaign, email, error)
+        return email, "failed"
+
+    # --- Batch ---
+    def send_batch(self, campaign, recipients):
+        # `recipients` yields dicts with "email" plus either "raw" or
+        # "subject"/"body". Returns counts, throughput and the addresses that
+        # are now confirmed sent (including ones sent by an earlier run),
+        # failed for good (the ledger never retries an address) or skipped
+        # because they are suppressed.
+        self._stop.clear()
+        ledger = get_ledger(campaign)
+        ledger.refresh()
+        suppressed = get_suppression_list()
+        suppressed.refresh()
+        report = {"campaign": campaign, "sent": 0, "failed": 0, "duplicates": 0, "deferred": 0, "suppressed": 0}
+        sent_emails = set()
+        failed_emails = set()
+        suppressed_emails = set()
+        seen = set()
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+        lock = threading.Lock()
+
+        def record(email, future):
+            try:
+                _, outcome = future.result()
+            except Exception:
+                # Counted as failed but not settled: with no ledger entry the
+                # address is tried again by the next run
+                logging.exception(f"Sending to {email} crashed")
+                outcome = None
+            try:
+                with lock:
+                    if outcome is None:
+                        report["failed"] += 1
+                        return
+                    report[outcome if outcome != "success" else "sent"] += 1
+                    if outcome == "success":
+                        sent_emails.add(email)
+                    elif outcome == "failed":
+                        failed_emails.add(email)
+                    elif outcome == "deferred":
+                        self._stop.set()  # daily quota exhausted
+            finally:
+                slots.release()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for item in recipients:
+                if self._stop.is_set():
+                    break
+                email = item["email"]
+                if email in seen:
+                    continue
+                seen.add(email)
+                if email in suppressed:
+                    report["suppressed"] += 1
+                    suppressed_emails.add(email)
+                    continue
+                status = ledger.status(email)
+                if status is not None:
+                    report["duplicates"] += 1
+                    (sent_emails if status == "success" else failed_emails).add(email)
+                    continue
+                slots.acquire()
+                future = pool.submit(self._send_one, campaign, item)
+                future.add_done_callback(lambda f, email=email: record(email, f))
+
+        elapsed = time.monotonic() - started
+        BATCH_SECONDS.observe(elapsed)
+        SENDS.labels("engine", "duplicate").inc(report["duplicates"])
+        SENDS.labels("engine", "suppressed").inc(report["suppressed"])
+        report["elapsed"] = round(elapsed, 3)
+        report["per_second"] = round(report["sent"] / elapsed, 2) if elapsed else 0.0
+        report["rate_limit"] = round(self.limiter.rate, 2)
+        report["sent_emails"] = sent_emails
+        report["failed_emails"] = failed_emails
+        report["suppressed_emails"] = suppressed_emails
+        report["quota_exhausted"] = report["deferred"] > 0
+        logging.info(
+            f"📈 {campaign}: sent {report['sent']}, failed {report['failed']}, "
+            f"skipped {report['duplicates']}, suppressed {report['suppressed']} in {report['elapsed']}s "
+            f"({report['per_second']}/s, limit {report['rate_limit']}/s)"
+        )
+        return report
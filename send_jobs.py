@@ -0,0 +1,338 @@
+# send_jobs.py — Background campaign sends queued from the dashboard
+#
+# The dashboard writes a job record and makes sure a runner process is
+# alive; runners (`python send_jobs.py`) claim queued jobs and send them
+# through SendEngine, rewriting the record with progress as they go.
+
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+from file_lock import locked
+
+JOBS_DIR = "logs/jobs"
+os.makedirs(JOBS_DIR, exist_ok=True)
+
+RUNNER_SLOTS = int(os.environ.get("SEND_JOB_RUNNERS", 2))   # runner processes at most
+CHUNK_ROWS = 100          # recipients per engine call (progress granularity)
+HEARTBEAT_INTERVAL = 5    # seconds
+STALE_AFTER = 60          # a running job with an older heartbeat is reclaimed
+KEEP_FINISHED = 200       # finished job records kept for the Send page
+KEEP_FINISHED_DAYS = 7
+
+ACTIVE = ("queued", "running", "cancelling")
+QUEUE_LOCK = os.path.join(JOBS_DIR, "queue")
+ACTIVE_INDEX = os.path.join(JOBS_DIR, "active.idx")  # ids of unfinished jobs, one per line
+
+
+def job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _cancel_marker(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.cancel")
+
+
+# --- Records ---
+def _write(job):
+    path = job_path(job["id"])
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp, path)
+
+
+def load_job(job_id):
+    try:
+        with open(job_path(job_id)) as f:
+            job = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if job["status"] == "running" and os.path.exists(_cancel_marker(job_id)):
+        job["status"] = "cancelling"
+    return job
+
+
+# --- Active index (caller holds the queue lock) ---
+def _active_ids():
+    try:
+        with open(ACTIVE_INDEX) as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        # Job records from before the index: built once from a full scan
+        names = sorted(n[:-5] for n in os.listdir(JOBS_DIR) if n.endswith(".json"))
+        ids = [i for i in names if (load_job(i) or {}).get("status") in ACTIVE]
+        _save_active(ids)
+        return ids
+
+
+def _save_active(ids):
+    tmp = f"{ACTIVE_INDEX}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write("".join(f"{i}\n" for i in ids))
+    os.replace(tmp, ACTIVE_INDEX)
+
+
+def _active_jobs():
+    # Loads only the unfinished jobs, dropping index entries that finished
+    jobs = [load_job(i) for i in _active_ids()]
+    live = [j for j in jobs if j and j["status"] in ACTIVE]
+    if len(live) != len(jobs):
+        _save_active([j["id"] for j in live])
+    return live
+
+
+def _prune_finished():
+    # Oldest finished records go once there are more than KEEP_FINISHED or
+    # they are older than KEEP_FINISHED_DAYS; ids sort by creation time
+    active = set(_active_ids())
+    cutoff = (datetime.utcnow() - timedelta(days=KEEP_FINISHED_DAYS)).strftime("%Y%m%d%H%M%S")
+    finished = sorted(n[:-5] for n in os.listdir(JOBS_DIR) if n.endswith(".json") and n[:-5] not in active)
+    excess = len(finished) - KEEP_FINISHED
+    for i, job_id in enumerate(finished):
+        if i < excess or job_id < cutoff:
+            for path in (job_path(job_id), _cancel_marker(job_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def list_jobs(campaign=None, limit=20):
+    # Newest first (ids start with their UTC creation time); one small JSON read per job
+    names = sorted((n for n in os.listdir(JOBS_DIR) if n.endswith(".json")), reverse=True)
+    jobs = []
+    for name in names:
+        job = load_job(name[:-5])
+        if job and (campaign is None or job["campaign"] == campaign):
+            jobs.append(job)
+            if len(jobs) >= limit:
+                break
+    return jobs
+
+
+def enqueue_send(campaign, subject, body, defaults=None):
+    # Sends the campaign's stored rows; returns the job id. A campaign has
+    # at most one unfinished job: two would race on the ledger and mail
+    # the same recipients twice.
+    job = {
+        "id": datetime.utcnow().strftime("%Y%m%d%H%M%S-") + uuid.uuid4().hex[:8],
+        "campaign": campaign,
+        "subject": subject,
+        "body": body,
+        "defaults": dict(defaults or {}),
+        "status": "queued",
+        "created": time.time(),
+        "resume_after": 0,
+        "next_row": 0,
+        "progress": {"total": 0, "sent": 0, "failed": 0, "skipped": 0, "rate": 0.0, "eta": None},
+        "runner": None,
+        "heartbeat": None,
+        "error": None,
+    }
+    with locked(QUEUE_LOCK):
+        active = [j for j in _active_jobs() if j["campaign"] == campaign]
+        if active:
+            raise ValueError(f"Campaign '{campaign}' already has an unfinished send job ({active[0]['id']}).")
+        _write(job)
+        _save_active(_active_ids() + [job["id"]])
+        _prune_finished()
+    return job["id"]
+
+
+def cancel_job(job_id):
+    # Queued jobs stop at once; a running job stops after its in-flight sends
+    with locked(QUEUE_LOCK):
+        job = load_job(job_id)
+        if job is None or job["status"] not in ACTIVE:
+            return False
+        if job["status"] == "queued":
+            job["status"] = "cancelled"
+            _write(job)
+            _save_active([i for i in _active_ids() if i != job_id])
+        else:
+            open(_cancel_marker(job_id), "w").close()
+        return True
+
+
+# --- Runner processes ---
+def _runnable(job, now):
+    if job["status"] == "queued":
+        return job["resume_after"] <= now
+    if job["status"] == "running":  # its runner died
+        return (job["heartbeat"] or 0) < now - STALE_AFTER
+    return False
+
+
+def _claim_next():
+    with locked(QUEUE_LOCK):
+        now = time.time()
+        jobs = _active_jobs()
+        # Never two runners on one campaign, even for jobs queued before
+        # enqueue_send refused duplicates
+        busy = {j["campaign"] for j in jobs if j["status"] != "queued" and not _runnable(j, now)}
+        candidates = [j for j in jobs if _runnable(j, now) and j["campaign"] not in busy]
+        if not candidates:
+            return None
+        job = min(candidates, key=lambda j: j["created"])
+        job.update(status="running", runner=os.getpid(), heartbeat=now)
+        _write(job)
+        return job
+
+
+def has_runnable_jobs():
+    # Reads the active index and those few records, not the whole history
+    now = time.time()
+    with locked(QUEUE_LOCK):
+        return any(_runnable(j, now) for j in _active_jobs())
+
+
+def ensure_runner():
+    # Starts a detached runner if there is work and a free runner slot.
+    # Runners exit when the queue is empty, so this is cheap to call often.
+    if not has_runnable_jobs():
+        return False
+    for slot in range(RUNNER_SLOTS):
+        with locked(os.path.join(JOBS_DIR, f"runner-{slot}"), blocking=False) as probe:
+            if not probe.acquired:
+                continue
+        with open(os.path.join(JOBS_DIR, f"runner-{slot}.log"), "a") as log:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--slot", str(slot)],
+                cwd=os.getcwd(),
+                start_new_session=True,  # outlives the dashboard process
+                stdout=subprocess.DEVNULL,
+                stderr=log,
+            )
+        return True
+    return False
+
+
+def _run_job(job, engine_factory):
+    from campaign_utils import iter_campaign_chunks, campaign_row_count
+    from email_template import EmailTemplate
+
+    try:
+        engine = engine_factory()  # logs in to Gmail
+    except Exception as e:
+        job.update(status="failed", runner=None, error=str(e))
+        with locked(QUEUE_LOCK):
+            _write(job)
+            _save_active([i for i in _active_ids() if i != job["id"]])
+        logging.error(f"Send job {job['id']} could not start: {e}")
+        return
+    subject_tpl = EmailTemplate(job["subject"], job["defaults"])
+    body_tpl = EmailTemplate(job["body"], job["defaults"])
+    progress = job["progress"]
+    progress["total"] = campaign_row_count(job["campaign"])
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def heartbeat():
+        # Keeps the record fresh and turns a cancel marker into engine.stop()
+        while not done.wait(HEARTBEAT_INTERVAL):
+            with lock:
+                job["heartbeat"] = time.time()
+                _write(job)
+            if os.path.exists(_cancel_marker(job["id"])):
+                engine.stop()
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    started, processed = time.monotonic(), 0
+    outcome = "done"
+    gap = False  # an earlier row is unsettled, so next_row must stay put
+    try:
+        for chunk in iter_campaign_chunks(job["campaign"]):
+            if chunk.empty or chunk.index[-1] < job["next_row"]:
+                continue
+            chunk = chunk.loc[job["next_row"]:]
+            for start in range(0, len(chunk), CHUNK_ROWS):
+                if os.path.exists(_cancel_marker(job["id"])):
+                    outcome = "cancelled"
+                    break
+                part = chunk.iloc[start:start + CHUNK_ROWS]
+                subjects = subject_tpl.render_frame(part)
+                bodies = body_tpl.render_frame(part)
+                items = [{"email": e, "subject": s, "body": b} for e, s, b in zip(part["email"], subjects, bodies)]
+                report = engine.send_batch(job["campaign"], items)
+                processed += report["sent"] + report["failed"]
+                elapsed = time.monotonic() - started
+                with lock:
+                    progress["sent"] += report["sent"]
+                    progress["failed"] += report["failed"]
+                    progress["skipped"] += report["duplicates"] + report["suppressed"]
+                    progress["rate"] = round(processed / elapsed, 2) if elapsed else 0.0
+                    # next_row only moves past settled rows. Rows left open
+                    # (deferred by the quota, cut off by a cancel, or whose
+                    # send crashed) are where a resumed job starts again;
+                    # the ledger skips anything after them that did go out.
+                    settled = report["sent_emails"] | report["failed_emails"] | report["suppressed_emails"]
+                    open_rows = part.index[~part["email"].isin(settled)]
+                    if not gap:
+                        if len(open_rows):
+                            job["next_row"], gap = int(open_rows[0]), True
+                        else:
+                            job["next_row"] = int(part.index[-1]) + 1
+                    if report["quota_exhausted"]:
+                        # Pick the rest up again tomorrow (UTC)
+                        tomorrow = datetime.utcnow().date() + timedelta(days=1)
+                        job["resume_after"] = datetime(
+                            tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc
+                        ).timestamp()
+                        outcome = "queued"
+                    remaining = max(0, progress["total"] - job["next_row"])
+                    progress["eta"] = round(remaining / progress["rate"]) if progress["rate"] else None
+                    job["heartbeat"] = time.time()
+                    _write(job)
+                if outcome == "done" and os.path.exists(_cancel_marker(job["id"])):
+                    outcome = "cancelled"  # the engine may have stopped part way
+                if outcome != "done":
+                    break
+            if outcome != "done":
+                break
+    except Exception as e:
+        outcome, job["error"] = "failed", str(e)
+        logging.exception(f"Send job {job['id']} failed")
+    finally:
+        done.set()
+        beat.join()
+    with lock, locked(QUEUE_LOCK):
+        job["status"] = outcome
+        job["runner"] = None
+        if outcome != "queued":
+            job["progress"]["eta"] = None
+            _save_active([i for i in _active_ids() if i != job["id"]])
+        _write(job)
+    if outcome == "cancelled" and os.path.exists(_cancel_marker(job["id"])):
+        os.remove(_cancel_marker(job["id"]))
+    logging.info(f"📦 Send job {job['id']} ({job['campaign']}): {outcome}, {progress}")
+
+
+def run_jobs(engine_factory=None):
+    # Works the queue until nothing is runnable
+    if engine_factory is None:
+        # Same engine as worker.py, on the shared per-second bucket and daily
+        # quota, so job runners and workers stay within one global budget
+        from worker import make_engine
+        from connect_gmail import get_gmail_client
+        engine_factory = lambda: make_engine(get_gmail_client(), shared=True)
+    while True:
+        job = _claim_next()
+        if job is None:
+            return
+        _run_job(job, engine_factory)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slot", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    with locked(os.path.join(JOBS_DIR, f"runner-{args.slot}"), blocking=False) as slot:
+        if slot.acquired:
+            run_jobs()
@@ -0,0 +1,202 @@
+# send_ledger.py — Append-only, indexed record of campaign sends
+
+import os
+import json
+import pickle
+import threading
+from datetime import datetime
+import metrics
+from file_lock import locked
+
+LEDGER_DIR = "logs/ledger"
+os.makedirs(LEDGER_DIR, exist_ok=True)
+
+LEDGER_IO_SECONDS = metrics.histogram("ledger_io_seconds", "Send ledger file I/O", ("op",))
+_APPEND_SECONDS = LEDGER_IO_SECONDS.labels("append")
+_CATCH_UP_SECONDS = LEDGER_IO_SECONDS.labels("catch_up")
+
+# Pre-ledger format written by connect_gmail.log_campaign_email
+LEGACY_LOG_PATTERN = "campaign_log_{campaign}.pkl"
+
+
+def ledger_path(campaign):
+    return os.path.join(LEDGER_DIR, f"{campaign}.jsonl")
+
+
+class SendLedger:
+    # One JSON record per line: {"email", "status", "ts"}. The in-memory
+    # index holds the latest status per address and is kept in sync with
+    # appends made by other processes by tailing the file from `offset`.
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+        self.path = ledger_path(campaign)
+        self._lock = threading.RLock()
+        self.index = {}
+        self.sent = 0
+        self.failed = 0
+        self.offset = 0
+        self._inode = None
+        with self._lock, locked(self.path):
+            self._migrate_legacy()
+            self._repair_tail()
+            self._catch_up()
+
+    # --- Index maintenance ---
+    def _apply(self, email, status):
+        previous = self.index.get(email)
+        if previous is not None:
+            if previous == "success":
+                self.sent -= 1
+            else:
+                self.failed -= 1
+        self.index[email] = status
+        if status == "success":
+            self.sent += 1
+        else:
+            self.failed += 1
+
+    def _catch_up(self):
+        # Read only the bytes appended since the last call
+        with _CATCH_UP_SECONDS.time():
+            self._read_new()
+
+    def _read_new(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._inode is not None and st.st_ino != self._inode:
+            # Replaced by a compaction in another process: rebuild
+            self.index, self.sent, self.failed, self.offset = {}, 0, 0, 0
+        self._inode = st.st_ino
+        if st.st_size == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial write in progress elsewhere
+                self.offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(record["email"], record["status"])
+
+    def _repair_tail(self):
+        # Drop a torn final record left behind by a crash mid-append
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = end
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                nl = chunk.rfind(b"\n")
+                if nl != -1:
+                    f.truncate(pos + nl + 1)
+                    return
+            f.truncate(0)
+
+    def _migrate_legacy(self):
+        legacy = LEGACY_LOG_PATTERN.format(campaign=self.campaign)
+        if not os.path.exists(legacy) or os.path.exists(self.path):
+            return
+        with open(legacy, "rb") as f:
+            entries = pickle.load(f)
+        ts = datetime.utcfromtimestamp(os.path.getmtime(legacy)).isoformat()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for email, status in entries:
+                f.write(json.dumps({"email": email, "status": status, "ts": ts}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        os.replace(legacy, legacy + ".migrated")
+
+    # --- Public API ---
+    def refresh(self):
+        with self._lock, locked(self.path):
+            self._catch_up()
+
+    def __contains__(self, email):
+        return email in self.index
+
+    @property
+    def version(self):
+        # Changes whenever the index has taken in new records
+        return (self._inode, self.offset)
+
+    def status(self, email):
+        return self.index.get(email)
+
+    def append(self, email, status):
+        line = json.dumps({
+            "email": email,
+            "status": status,
+            "ts": datetime.utcnow().isoformat(),
+        }) + "\n"
+        with self._lock, locked(self.path):
+            self._catch_up()
+            with _APPEND_SECONDS.time():
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line.encode())
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self.offset += len(line.encode())
+            self._apply(email, status)
+
+    def entries(self):
+        # (email, latest status) pairs, in the shape of the old pickle log
+        with self._lock:
+            return list(self.index.items())
+
+    def summary(self):
+        with self._lock:
+            return {
+                "campaign": self.campaign,
+                "recipients": len(self.index),
+                "sent": self.sent,
+                "failed": self.failed,
+            }
+
+    def compact(self):
+        # Rewrite the file with one record per address, atomically
+        with self._lock, locked(self.path):
+            self._catch_up()
+            ts = datetime.utcnow().isoformat()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                for email, status in self.index.items():
+                    f.write(json.dumps({"email": email, "status": status, "ts": ts}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            st = os.stat(self.path)
+            self.offset, self._inode = st.st_size, st.st_ino
+
+
+# --- Process-wide registry ---
+_ledgers = {}
+_registry_lock = threading.Lock()
+
+
+def get_ledger(campaign):
+    campaign = str(campaign)
+    with _registry_lock:
+        ledger = _ledgers.get(campaign)
+        if ledger is None:
+            ledger = _ledgers[campaign] = SendLedger(campaign)
+    return ledger
@@ -0,0 +1,293 @@
+# suppression.py — Global do-not-mail list shared by every campaign
+
+import os
+import json
+import math
+import mmap
+import hashlib
+import threading
+from datetime import datetime
+import numpy as np
+from email_extract import normalize_email
+from file_lock import locked
+
+SUPPRESSION_DIR = "logs/suppression"
+os.makedirs(SUPPRESSION_DIR, exist_ok=True)
+
+REASONS = ("bounce", "unsubscribe", "complaint", "manual")
+FALSE_POSITIVE_RATE = 0.01
+COMPACT_THRESHOLD = 100_000   # delta records before add() folds them into the base
+
+_EMPTY = np.empty(0, dtype=np.uint64)
+
+
+def email_hash(email):
+    # 64-bit key for an address; the same function is used in bulk below
+    return int.from_bytes(hashlib.blake2b(normalize_email(email).encode(), digest_size=8).digest(), "little")
+
+
+def _hash_many(emails):
+    return np.fromiter((email_hash(e) for e in emails), dtype=np.uint64, count=len(emails))
+
+
+def _bloom_params(n):
+    # Sized for the next power of two, so most compactions only add bits to
+    # the existing filter instead of rebuilding it
+    n = 1 << max(16, math.ceil(math.log2(max(n, 1))))
+    bits = max(64, int(-n * math.log(FALSE_POSITIVE_RATE) / math.log(2) ** 2))
+    bits = (bits + 7) // 8 * 8
+    k = max(1, round(bits / n * math.log(2)))
+    return bits, k
+
+
+def _bloom_positions(hashes, bits, k):
+    # Double hashing: position i = (h1 + i * h2) mod bits, vectorized
+    h1 = hashes & np.uint64(0xFFFFFFFF)
+    h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+    i = np.arange(k, dtype=np.uint64)
+    return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(bits)
+
+
+class SuppressionList:
+    # Two tiers. The base is a sorted array of 64-bit address hashes plus a
+    # Bloom filter over it, both memory-mapped, so tens of millions of
+    # addresses cost 8 bytes + ~10 bits each and nothing is parsed at load.
+    # New suppressions are appended to a JSONL delta (which also keeps the
+    # address, reason and time for auditing) and held in a set until
+    # compact() folds them into a new base.
+    #
+    # A lookup is: delta set -> Bloom filter (almost every clean address stops
+    # here) -> binary search of the base to rule out false positives.
+
+    def __init__(self, directory=SUPPRESSION_DIR):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "base.json")
+        self.delta_path = os.path.join(directory, "delta.jsonl")
+        self._lock = threading.RLock()
+        self._base = _EMPTY
+        self._bloom = b""
+        self._bloom_bits = 0
+        self._bloom_k = 0
+        self._generation = None
+        self._inode = None
+        self.delta = set()
+        self.delta_count = 0
+        self.offset = 0
+        with self._lock, locked(self.delta_path):
+            self._catch_up()
+
+    # --- Loading ---
+    def _generation_paths(self, generation):
+        return (os.path.join(self.directory, f"base.{generation}.u64"),
+                os.path.join(self.directory, f"base.{generation}.bloom"))
+
+    def _load_base(self):
+        # base.json is written last by compact() and names the generation's
+        # files, so it only ever points at a complete base and Bloom filter
+        meta = {"generation": 0, "count": 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        self._generation = meta["generation"]
+        self.delta, self.delta_count, self.offset = set(), 0, 0
+        if not meta["count"]:
+            self._base, self._bloom, self._bloom_bits, self._bloom_k = _EMPTY, b"", 0, 0
+            return
+        base_path, bloom_path = self._generation_paths(meta["generation"])
+        try:
+            sizes = os.path.getsize(base_path), os.path.getsize(bloom_path)
+        except FileNotFoundError:
+            sizes = None
+        if sizes != (meta["count"] * 8, meta["bloom_bits"] // 8):
+            raise RuntimeError(f"Suppression base generation {meta['generation']} in {self.directory} is incomplete")
+        self._base = np.memmap(base_path, dtype=np.uint64, mode="r")
+        with open(bloom_path, "rb") as f:
+            self._bloom = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._bloom_bits, self._bloom_k = meta["bloom_bits"], meta["bloom_k"]
+
+    def _catch_up(self):
+        # Read only the delta bytes appended since the last call. compact()
+        # swaps in a fresh delta file, so a new inode means a new base.
+        try:
+            st = os.stat(self.delta_path)
+        except FileNotFoundError:
+            st = None
+        inode = st.st_ino if st else None
+        if self._generation is None or inode != self._inode:
+            self._load_base()
+            self._inode = inode
+        if st is None or st.st_size == self.offset:
+            return
+        with open(self.delta_path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial write in progress elsewhere
+                self.offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.delta.add(record["hash"])
+                self.delta_count += 1
+
+    def refresh(self):
+        with self._lock, locked(self.delta_path):
+            self._catch_up()
+
+    # --- Lookups ---
+    def _in_base(self, h):
+        bits = self._bloom_bits
+        if not bits:
+            return False
+        bloom = self._bloom
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        for i in range(self._bloom_k):
+            pos = (h1 + i * h2) % bits
+            if not bloom[pos >> 3] & (1 << (pos & 7)):
+                return False
+        idx = int(np.searchsorted(self._base, np.uint64(h)))
+        return idx < len(self._base) and int(self._base[idx]) == h
+
+    def __contains__(self, email):
+        h = email_hash(email)
+        return h in self.delta or self._in_base(h)
+
+    def __len__(self):
+        return len(self._base) + len(self.delta)
+
+    def contains_many(self, emails):
+        # Boolean mask aligned with `emails`, computed array-at-a-time
+        emails = list(emails)
+        if not emails:
+            return np.zeros(0, dtype=bool)
+        hashes = _hash_many(emails)
+        mask = np.isin(hashes, np.fromiter(self.delta, dtype=np.uint64, count=len(self.delta)))
+        if self._bloom_bits:
+            bloom = np.frombuffer(self._bloom, dtype=np.uint8)
+            pos = _bloom_positions(hashes, self._bloom_bits, self._bloom_k)
+            maybe = ((bloom[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+            candidates = np.flatnonzero(maybe & ~mask)
+            if len(candidates):
+                idx = np.searchsorted(self._base, hashes[candidates])
+                idx = np.minimum(idx, len(self._base) - 1)
+                mask[candidates] = self._base[idx] == hashes[candidates]
+        return mask
+
+    def filter_frame(self, df, column="email"):
+        # (kept rows, suppressed rows) of an uploaded contact list
+        mask = self.contains_many(df[column].fillna("").astype(str).tolist())
+        return df[~mask], df[mask]
+
+    # --- Writes ---
+    def add(self, emails, reason="manual"):
+        # Returns how many addresses were newly suppressed
+        if isinstance(emails, str):
+            emails = [emails]
+        ts = datetime.utcnow().isoformat()
+        with self._lock, locked(self.delta_path):
+            self._catch_up()
+            lines = []
+            for email in emails:
+                h = email_hash(email)
+                if h in self.delta or self._in_base(h):
+                    continue
+                self.delta.add(h)
+                lines.append(json.dumps({"hash": h, "email": normalize_email(email), "reason": reason, "ts": ts}) + "\n")
+            if not lines:
+                return 0
+            data = "".join(lines).encode()
+            fd = os.open(self.delta_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+                self._inode = os.fstat(fd).st_ino
+            finally:
+                os.close(fd)
+            self.offset += len(data)
+            self.delta_count += len(lines)
+            if self.delta_count >= COMPACT_THRESHOLD:
+                self._compact()
+            return len(lines)
+
+    def compact(self):
+        with self._lock, locked(self.delta_path):
+            self._catch_up()
+            self._compact()
+
+    def _compact(self):
+        # Merge the delta into a new base generation. The delta's records are
+        # archived (not discarded) so the audit trail survives.
+        if not self.delta:
+            return
+        # The base is already sorted, so this is a sort of the (small) delta
+        # plus one linear merge. Delta hashes already in the base (left by a
+        # compaction interrupted before the delta was swapped) are dropped.
+        delta = np.sort(np.fromiter(self.delta, dtype=np.uint64, count=len(self.delta)))
+        base = np.asarray(self._base)
+        if len(base):
+            idx = np.minimum(np.searchsorted(base, delta), len(base) - 1)
+            delta = delta[base[idx] != delta]
+        hashes = np.insert(base, np.searchsorted(base, delta), delta)
+        bits, k = _bloom_params(len(hashes))
+        if (bits, k) == (self._bloom_bits, self._bloom_k):
+            bloom = np.frombuffer(self._bloom, dtype=np.uint8).copy()
+            pos = _bloom_positions(delta, bits, k).ravel()
+            np.bitwise_or.at(bloom, pos >> np.uint64(3), np.uint8(1) << (pos & np.uint64(7)).astype(np.uint8))
+        else:
+            flags = np.zeros(bits, dtype=bool)
+            for start in range(0, len(hashes), 1_000_000):
+                flags[_bloom_positions(hashes[start:start + 1_000_000], bits, k).ravel()] = True
+            bloom = np.packbits(flags, bitorder="little")  # bit `pos` is byte pos >> 3, bit pos & 7
+            del flags
+        generation = self._generation + 1
+
+        # New files under the new generation's names, then the meta that
+        # points at them: a crash part way leaves the old generation in use
+        for path, array in zip(self._generation_paths(generation), (hashes, bloom)):
+            with open(path, "wb") as f:
+                f.write(array.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"generation": generation, "count": len(hashes), "bloom_bits": bits, "bloom_k": k}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.meta_path)
+        for path in self._generation_paths(self._generation):
+            try:
+                os.remove(path)  # readers still mapping it keep their copy
+            except OSError:
+                pass
+
+        with open(self.delta_path, "rb") as src, open(os.path.join(self.directory, "archive.jsonl"), "ab") as dst:
+            dst.write(src.read(self.offset))
+        tmp = self.delta_path + ".tmp"
+        open(tmp, "wb").close()
+        os.replace(tmp, self.delta_path)
+        self._generation = None
+        self._catch_up()
+
+
+# --- Process-wide instance ---
+_suppression = None
+_suppression_lock = threading.Lock()
+
+
+def get_suppression_list():
+    global _suppression
+    with _suppression_lock:
+        if _suppression is None:
+            _suppression = SuppressionList()
+    return _suppression
+
+
+def is_suppressed(email):
+    return email in get_suppression_list()
+
+
+def suppress(emails, reason="manual"):
+    if reason not in REASONS:
+        raise ValueError(f"Unknown suppression reason: {reason}")
+    return get_suppression_list().add(emails, reason)
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The app keeps its state under relative logs/ and campaigns/ directories and
+# creates them at import time, so modules are imported from a scratch directory
+os.chdir(tempfile.mkdtemp(prefix="ghostbot-tests-"))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Each test gets empty state directories of its own
+    monkeypatch.chdir(tmp_path)
+    for directory in ("campaigns", "logs/cursors", "logs/batches", "logs/spool", "logs/ledger",
+                      "logs/followups", "logs/tracking", "logs/jobs", "logs/quota", "logs/suppression",
+                      "logs/leases", "logs/inbox", "logs/cache/search"):
+        os.makedirs(directory, exist_ok=True)
+    return tmp_path
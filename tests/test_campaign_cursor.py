@@ -0,0 +1,40 @@
+import os
+import pickle
+
+import pytest
+
+from campaign_cursor import CampaignCursor, LEGACY_BATCH_DIR
+
+
+def write_legacy_batch(campaign, batch, sent):
+    path = os.path.join(LEGACY_BATCH_DIR, f"{campaign}_batch{batch}.pkl")
+    with open(path, "wb") as f:
+        pickle.dump(set(sent), f)
+    return path
+
+
+def test_legacy_progress_survives_a_failed_first_run():
+    legacy = write_legacy_batch("spring", 0, {"a@x.com", "b@x.com"})
+
+    with pytest.raises(RuntimeError):
+        with CampaignCursor("spring"):
+            raise RuntimeError("reading the campaign rows failed")
+
+    assert os.path.exists(legacy + ".migrated")
+    with CampaignCursor("spring") as cursor:
+        assert cursor.sent(0) == {"a@x.com", "b@x.com"}
+
+
+def test_legacy_files_are_kept_when_the_cursor_cannot_be_saved(monkeypatch):
+    legacy = write_legacy_batch("spring", 0, {"a@x.com"})
+
+    def fail():
+        raise OSError("disk full")
+
+    cursor = CampaignCursor("spring")
+    monkeypatch.setattr(cursor, "_save", fail)
+    with pytest.raises(OSError):
+        with cursor:
+            pass
+
+    assert os.path.exists(legacy)
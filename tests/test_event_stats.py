@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from event_store import event_path
+from event_stats import parse_time_bound
+from track_api import app
+
+
+def write_opens(campaign, *timestamps):
+    with open(event_path(campaign, "open"), "w") as f:
+        for i, ts in enumerate(timestamps):
+            f.write(json.dumps({"id": f"{campaign}:u{i}@example.com", "timestamp": ts}) + "\n")
+
+
+def opens(**params):
+    response = app.test_client().get("/stats", query_string={"details": "open", **params})
+    return response.status_code, response.get_json()
+
+
+def test_out_of_order_event_is_not_dropped_by_until():
+    # A late append for 09:xx lands after an event from the next hour
+    write_opens("late", "2026-10-18T09:10:00", "2026-10-18T10:05:00", "2026-10-18T09:59:00")
+
+    status, body = opens(campaign="late", until="2026-10-18T09:59:59")
+
+    assert status == 200
+    assert [e["timestamp"] for e in body["events"]] == ["2026-10-18T09:10:00", "2026-10-18T09:59:00"]
+
+
+def test_date_only_until_covers_the_whole_day():
+    write_opens("day", "2026-10-17T23:00:00", "2026-10-18T18:30:00", "2026-10-19T00:00:00")
+
+    status, body = opens(campaign="day", since="2026-10-18", until="2026-10-18")
+
+    assert status == 200
+    assert [e["timestamp"] for e in body["events"]] == ["2026-10-18T18:30:00"]
+
+
+@pytest.mark.parametrize("param", ["since", "until"])
+def test_malformed_bound_is_rejected(param):
+    status, body = opens(campaign="any", **{param: "yesterday"})
+
+    assert status == 400 and "error" in body
+
+
+def test_aware_bound_is_normalized_to_utc():
+    assert parse_time_bound("2026-10-18T12:00:00+02:00") == "2026-10-18T10:00:00"
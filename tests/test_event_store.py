@@ -0,0 +1,55 @@
+import json
+
+import event_store
+from event_store import EventWriter, legacy_path, load_events, DEAD_LETTER_PATH
+
+
+def writer_with(*events):
+    writer = EventWriter()
+    writer._ensure_thread = lambda: None  # flushed by the test, not a thread
+    for campaign, event_type, entry in events:
+        writer.record(campaign, event_type, entry)
+    return writer
+
+
+def corrupt_legacy_file(campaign, event_type):
+    with open(legacy_path(campaign, event_type), "w") as f:
+        f.write("[{not json")
+
+
+def test_failing_group_does_not_block_the_others():
+    corrupt_legacy_file("bad", "open")
+    writer = writer_with(("bad", "open", {"id": "1"}), ("good", "open", {"id": "2"}))
+
+    assert writer.flush() == 1
+    assert load_events("good", "open") == [{"id": "2"}]
+    assert [p[0] for p in writer._pending] == ["bad"]
+
+
+def test_poison_group_is_dead_lettered_after_the_retry_cap(monkeypatch):
+    monkeypatch.setattr(event_store, "FLUSH_RETRIES", 3)
+    corrupt_legacy_file("bad", "open")
+    writer = writer_with(("bad", "open", {"id": "1"}))
+
+    for _ in range(3):
+        writer.flush()
+
+    assert writer._pending == []
+    with open(DEAD_LETTER_PATH) as f:
+        record = json.loads(f.readline())
+    assert record["campaign"] == "bad" and json.loads(record["event"]) == {"id": "1"}
+
+
+def test_transient_failure_keeps_events_in_order(monkeypatch):
+    writer = writer_with(("c", "click", {"id": "1"}))
+    real_append = event_store._append
+
+    def fail_once(*args):
+        monkeypatch.setattr(event_store, "_append", real_append)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(event_store, "_append", fail_once)
+    assert writer.flush() == 0
+    writer.record("c", "click", {"id": "2"})
+    assert writer.flush() == 2
+    assert load_events("c", "click") == [{"id": "1"}, {"id": "2"}]
@@ -0,0 +1,71 @@
+import pytest
+
+from followup_scheduler import FollowUpScheduler, followup_campaign
+
+
+def report(sent=(), failed=(), suppressed=(), deferred=0):
+    return {"sent": len(sent), "failed": len(failed), "duplicates": 0, "suppressed": len(suppressed),
+            "deferred": deferred, "quota_exhausted": deferred > 0, "sent_emails": set(sent),
+            "failed_emails": set(failed), "suppressed_emails": set(suppressed)}
+
+
+def schedule(scheduler, *emails, step=1):
+    return scheduler.schedule([
+        {"email": e, "subject": "s", "body": "b", "campaign": "c", "step": step, "due": 0} for e in emails
+    ])
+
+
+class Engine:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = []
+
+    def send_batch(self, campaign, jobs):
+        self.calls.append((campaign, [j["email"] for j in jobs]))
+        return self.outcome(jobs)
+
+
+def test_crashed_sends_stay_pending():
+    scheduler = FollowUpScheduler()
+    schedule(scheduler, "a@x.com", "b@x.com")
+    # b@x.com's send future raised: the engine counts it failed but leaves it unsettled
+    engine = Engine(lambda jobs: report(sent=["a@x.com"]))
+
+    scheduler.run_due(engine)
+
+    assert len(engine.calls) == 1  # not retried in a loop within the same run
+    assert [job["email"] for job in scheduler.jobs.values()] == ["b@x.com"]
+    assert [job["email"] for job in scheduler.take_due()] == ["b@x.com"]
+
+
+def test_settled_jobs_complete():
+    scheduler = FollowUpScheduler()
+    schedule(scheduler, "a@x.com", "b@x.com", "c@x.com")
+    engine = Engine(lambda jobs: report(sent=["a@x.com"], failed=["b@x.com"], suppressed=["c@x.com"]))
+
+    scheduler.run_due(engine)
+
+    assert scheduler.pending() == 0
+
+
+def test_each_step_has_its_own_ledger():
+    scheduler = FollowUpScheduler()
+    schedule(scheduler, "a@x.com", step=1)
+    schedule(scheduler, "a@x.com", step=2)
+    engine = Engine(lambda jobs: report(sent=[j["email"] for j in jobs]))
+
+    scheduler.run_due(engine)
+
+    assert sorted(c for c, _ in engine.calls) == [followup_campaign("c", 1), followup_campaign("c", 2)]
+
+
+def test_jobs_go_back_when_the_engine_raises():
+    scheduler = FollowUpScheduler()
+    schedule(scheduler, "a@x.com")
+
+    def boom(jobs):
+        raise RuntimeError("auth failed")
+
+    with pytest.raises(RuntimeError):
+        scheduler.run_due(Engine(boom))
+    assert [job["email"] for job in scheduler.take_due()] == ["a@x.com"]
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from outbox_spool import build_spool, iter_spool, spool_path
+
+
+def emails(campaign, batch):
+    return [r["email"] for r in iter_spool(campaign, batch)]
+
+
+def test_existing_spool_is_reused_for_the_same_batch():
+    recipients = [("a@x.com", "Hi", "Body")]
+    path = build_spool("c", 0, recipients)
+    mtime = os.stat(path).st_mtime_ns
+    build_spool("c", 0, recipients)
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_spool_is_rebuilt_when_the_batch_changes():
+    build_spool("c", 0, [("old@x.com", "Hi (2026-01-01)", "Body")])
+    build_spool("c", 0, [("a@x.com", "Hi (2026-01-02)", "Body"), ("b@x.com", "Hi (2026-01-02)", "Body")])
+    assert emails("c", 0) == ["a@x.com", "b@x.com"]
+
+
+def test_addresses_with_control_characters_are_rejected():
+    with pytest.raises(ValueError):
+        build_spool("c", 0, [("a@x.com\tinjected", "Hi", "Body")])
+    assert not os.path.exists(spool_path("c", 0))
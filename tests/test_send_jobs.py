@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+
+import send_jobs
+from campaign_utils import save_campaign_data
+
+
+def report(sent, deferred=0):
+    return {"sent": len(sent), "failed": 0, "duplicates": 0, "suppressed": 0, "deferred": deferred,
+            "quota_exhausted": deferred > 0, "sent_emails": set(sent), "failed_emails": set(),
+            "suppressed_emails": set()}
+
+
+class Engine:
+    # Sends the first `limit` recipients it is handed, then behaves as if stopped
+    def __init__(self, limit, on_stop=None, deferred=0):
+        self.limit = limit
+        self.on_stop = on_stop
+        self.deferred = deferred
+
+    def stop(self):
+        pass
+
+    def send_batch(self, campaign, items):
+        sent = [item["email"] for item in items][:self.limit]
+        if len(sent) < len(items) and self.on_stop:
+            self.on_stop()
+        return report(sent, self.deferred if len(sent) < len(items) else 0)
+
+
+def run_one(engine):
+    job = send_jobs._claim_next()
+    send_jobs._run_job(job, lambda: engine)
+    return send_jobs.load_job(job["id"])
+
+
+def test_cancel_mid_part_keeps_unsent_rows():
+    save_campaign_data("c", pd.DataFrame({"email": [f"u{i}@x.com" for i in range(10)]}))
+    job_id = send_jobs.enqueue_send("c", "Hi", "Body")
+
+    def cancel():
+        open(send_jobs._cancel_marker(job_id), "w").close()
+
+    job = run_one(Engine(limit=4, on_stop=cancel))
+
+    assert job["status"] == "cancelled"
+    assert job["next_row"] == 4
+
+
+def test_quota_stop_resumes_at_the_first_unsent_row():
+    save_campaign_data("c", pd.DataFrame({"email": [f"u{i}@x.com" for i in range(10)]}))
+    send_jobs.enqueue_send("c", "Hi", "Body")
+
+    job = run_one(Engine(limit=7, deferred=3))
+
+    assert job["status"] == "queued"
+    assert job["next_row"] == 7
+    assert job["resume_after"] > 0
+
+
+def test_finished_job_covers_every_row():
+    save_campaign_data("c", pd.DataFrame({"email": [f"u{i}@x.com" for i in range(250)]}))
+    send_jobs.enqueue_send("c", "Hi", "Body")
+
+    job = run_one(Engine(limit=1000))
+
+    assert job["status"] == "done"
+    assert job["next_row"] == 250
+    assert not os.path.exists(send_jobs._cancel_marker(job["id"]))
@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+import worker
+from campaign_utils import save_campaign_data
+from outbox_spool import build_spool, spool_path
+
+
+class FakeEngine:
+    # Stands in for SendEngine: "sends" every recipient it is handed
+    def __init__(self):
+        self.seen = []
+
+    def send_batch(self, campaign, recipients):
+        sent = {r["email"] for r in recipients}
+        self.seen.extend(sorted(sent))
+        return {"sent": len(sent), "failed": 0, "duplicates": 0, "suppressed": 0, "deferred": 0,
+                "quota_exhausted": False, "sent_emails": sent, "failed_emails": set(),
+                "suppressed_emails": set()}
+
+
+def test_stale_spool_from_an_earlier_upload_does_not_stall_the_batch():
+    build_spool("c", 0, [("old@x.com", "Old subject", "Old body")])
+    save_campaign_data("c", pd.DataFrame({"email": ["a@x.com", "b@x.com"], "name": ["A", "B"]}))
+    engine = FakeEngine()
+
+    assert worker.send_next_batch(engine, "c")["sent"] == 2
+    assert engine.seen == ["a@x.com", "b@x.com"]
+    assert not os.path.exists(spool_path("c", 0))
+    assert worker.send_next_batch(engine, "c") is None
+
+
+def test_malformed_addresses_are_settled_without_sending():
+    save_campaign_data("c", pd.DataFrame({"email": ["a@x.com", "b@x.com\nBcc: z@x.com"]}))
+    engine = FakeEngine()
+
+    worker.send_next_batch(engine, "c")
+    assert engine.seen == ["a@x.com"]
+    assert worker.send_next_batch(engine, "c") is None
@@ -1,41 +1,54 @@
 # track_api.py — Open & Click Tracking Server with Stats + CORS Support + Chart Data
 
-from flask import Flask, request, send_file, redirect, jsonify
-from flask_cors import CORS
 import os
-import json
+import time
+from flask import Flask, Response, request, send_file, redirect, jsonify, g, abort
+from flask_cors import CORS
 from datetime import datetime
-from collections import Counter
+from event_store import record_event
+from event_stats import get_campaign_stats, parse_time_bound, EVENT_TYPES
+import metrics
 
 app = Flask(__name__)
 CORS(app)  # allow cross-origin requests from dashboard
 
-TRACK_LOG_DIR = "logs/tracking"
-os.makedirs(TRACK_LOG_DIR, exist_ok=True)
-
 PIXEL_PATH = "static/pixel.png"
 
-# Utility: write tracking data
+# Enables /debug/profile when set; requests must pass it as ?token=
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+
+REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Tracking API request latency", ("endpoint",))
+REQUESTS = metrics.counter("http_requests_total", "Tracking API requests", ("endpoint", "status"))
+LOG_EVENT_SECONDS = metrics.histogram("log_event_seconds", "Time to record one open/click event")
+EVENTS = metrics.counter("events_total", "Open/click events recorded", ("type",))
+
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
 
+
+@app.after_request
+def _record_request(response):
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - g.request_start)
+    REQUESTS.labels(endpoint, str(response.status_code)).inc()
+    return response
+
+
+# Utility: write tracking data (buffered, appended in batches by event_store)
+
+@LOG_EVENT_SECONDS.time()
 def log_event(event_type, tracking_id):
     campaign = tracking_id.split(":")[0] if ":" in tracking_id else "unknown"
-    log_path = os.path.join(TRACK_LOG_DIR, f"{campaign}_{event_type}.json")
 
     entry = {
         "timestamp": datetime.utcnow().isoformat(),
         "id": tracking_id
     }
 
-    if os.path.exists(log_path):
-        with open(log_path, "r") as f:
-            data = json.load(f)
-    else:
-        data = []
-
-    data.append(entry)
-
-    with open(log_path, "w") as f:
-        json.dump(data, f, indent=2)
+    record_event(campaign, event_type, entry)
+    EVENTS.labels(event_type).inc()
 
 
 # 📬 Open Tracking
@@ -59,36 +72,57 @@ def track_click():
 
 
 # 📊 API to return tracking stats
+# Aggregates are maintained incrementally; raw events are available with
+# ?details=open|click&since=<iso>&until=<iso>&cursor=<next_cursor>&limit=<n>
 @app.route("/stats")
 def tracking_stats():
     campaign = request.args.get("campaign")
     if not campaign:
         return jsonify({"error": "campaign query param required"}), 400
 
-    def load_event(event_type):
-        path = os.path.join(TRACK_LOG_DIR, f"{campaign}_{event_type}.json")
-        if os.path.exists(path):
-            with open(path) as f:
-                return json.load(f)
-        return []
-
-    opens = load_event("open")
-    clicks = load_event("click")
-
-    # Count open and click per email (extracted from tracking ID)
-    def count_by_email(events):
-        ids = [e["id"].split(":")[1] for e in events if ":" in e["id"]]
-        return dict(Counter(ids))
-
-    return jsonify({
-        "campaign": campaign,
-        "opens": len(opens),
-        "clicks": len(clicks),
-        "open_details": opens,
-        "click_details": clicks,
-        "open_by_email": count_by_email(opens),
-        "click_by_email": count_by_email(clicks)
-    })
+    stats = get_campaign_stats(campaign)
+    details = request.args.get("details")
+    if details:
+        if details not in EVENT_TYPES:
+            return jsonify({"error": "details must be 'open' or 'click'"}), 400
+        try:
+            limit = int(request.args.get("limit", 100))
+            cursor = request.args.get("cursor")
+            cursor = int(cursor) if cursor is not None else None
+        except ValueError:
+            return jsonify({"error": "limit and cursor must be integers"}), 400
+        if limit < 1 or (cursor is not None and cursor < 0):
+            return jsonify({"error": "limit must be positive and cursor non-negative"}), 400
+        try:
+            since, until = request.args.get("since"), request.args.get("until")
+            since = parse_time_bound(since) if since else None
+            until = parse_time_bound(until, end=True) if until else None
+        except ValueError:
+            return jsonify({"error": "since and until must be ISO dates or datetimes"}), 400
+        return jsonify(stats.query(details, since=since, until=until, cursor=cursor, limit=min(limit, 1000)))
+
+    return jsonify(stats.summary())
+
+
+# 📈 Prometheus scrape endpoint
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# 🔬 Sampling profiler, switched at runtime:
+# /debug/profile?token=..&action=start|stop  (GET returns the collapsed stacks so far)
+@app.route("/debug/profile")
+def debug_profile():
+    if not PROFILE_TOKEN or request.args.get("token") != PROFILE_TOKEN:
+        abort(404)
+    action = request.args.get("action")
+    if action == "start":
+        metrics.start_profiler()
+        return jsonify({"profiling": True})
+    if action == "stop":
+        return jsonify({"profiling": False, "report": metrics.stop_profiler()})
+    return Response(metrics.get_profiler().collapsed(), mimetype="text/plain")
 
 
 # Run locally (dev only)
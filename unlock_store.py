@@ -0,0 +1,106 @@
+# unlock_store.py — Append-only per-user record of unlocked curator contacts
+
+import os
+import csv
+import io
+import threading
+from file_lock import locked
+
+
+def _cell(value):
+    if value is None or value != value:  # None / NaN
+        return ""
+    return value
+
+
+class UnlockStore:
+    # Rows are only ever appended (under flock, so two tabs or processes can
+    # unlock at once). The email index tails the file from the last offset
+    # it read, so "already unlocked?" never re-reads the whole history.
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = None
+        self.emails = set()
+        self.offset = 0
+        self._lock = threading.Lock()
+        with self._lock, locked(path):
+            self._catch_up()
+
+    def _catch_up(self):
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if size == self.offset:
+            return
+        with open(self.path, newline="") as f:
+            f.seek(self.offset)
+            reader = csv.reader(f)
+            if self.columns is None:
+                self.columns = next(reader, None)
+            email_col = self.columns.index("email") if self.columns and "email" in self.columns else None
+            for record in reader:
+                if email_col is not None and email_col < len(record):
+                    self.emails.add(record[email_col])
+        self.offset = size
+
+    def refresh(self):
+        with self._lock, locked(self.path):
+            self._catch_up()
+
+    def __contains__(self, email):
+        return email in self.emails
+
+    def __len__(self):
+        return len(self.emails)
+
+    def add(self, rows):
+        # Appends rows (dicts / Series) whose email is not stored yet and
+        # returns how many were written
+        rows = [dict(r) for r in rows]
+        with self._lock, locked(self.path):
+            self._catch_up()
+            if self.columns is None and rows:
+                self.columns = list(rows[0].keys())
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            if self.offset == 0:
+                writer.writerow(self.columns)
+            added = set()
+            for row in rows:
+                email = row.get("email")
+                if not email or email in self.emails or email in added:
+                    continue
+                added.add(email)
+                writer.writerow([_cell(row.get(c)) for c in self.columns])
+            if not added:
+                return 0
+            data = buf.getvalue().encode()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.offset += len(data)
+            self.emails |= added
+            return len(added)
+
+    def export_bytes(self):
+        # The file already is the CSV export; hand it over as-is
+        if not os.path.exists(self.path):
+            return b""
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_unlock_store(path):
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = UnlockStore(path)
+    return store
@@ -1,45 +1,202 @@
 # worker.py — Scheduled Background Sender for Large Campaigns
 
-import time
 from datetime import datetime
-from connect_gmail import login_to_gmail, send_email
-from campaign_utils import load_campaign_data, get_next_batch, save_sent_batch
+from connect_gmail import get_gmail_client, sync_replies, log_campaign_email
+from send_engine import SendEngine
+from email_template import EmailTemplate
+from outbox_spool import build_spool, iter_spool, remove_spool, invalid_address
+from campaign_utils import list_campaigns, get_next_batch, save_sent_batch
+from suppression import get_suppression_list
+from followup_scheduler import get_scheduler
+from rate_limit import RateLimiter
+from batch_leases import BatchLeases, LEASE_TTL
 import os
+import sys
+import time
 import logging
+import argparse
+import subprocess
+import metrics
 
-logging.basicConfig(level=logging.INFO)
+# Send limits (override per deployment)
+SEND_WORKERS = int(os.environ.get("SEND_WORKERS", 4))
+SEND_PER_SECOND = float(os.environ.get("SEND_PER_SECOND", 2))
+SEND_PER_DAY = int(os.environ.get("SEND_PER_DAY", 2000))
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", 60))  # seconds between summaries
+SHARD_POLL_INTERVAL = 30  # seconds an idle --follow shard waits before claiming again
 
-# List all campaigns
-CAMPAIGN_DIR = "campaigns"
-campaign_files = [f for f in os.listdir(CAMPAIGN_DIR) if f.endswith(".csv")]
-campaign_names = [f.replace(".csv", "") for f in campaign_files]
+# Follow-up message, rendered per batch
+SUBJECT_TEMPLATE = EmailTemplate("Follow-up from GhostBot ({date})")
+BODY_TEMPLATE = EmailTemplate("Hi {name|there}, just checking in as promised.<br><br>— GhostBot")
 
-# Gmail credentials
-creds = login_to_gmail()
 
-# Loop through all campaigns
-for campaign in campaign_names:
+def send_next_batch(engine, campaign):
+    # Sends the campaign's next unsent batch; returns the engine report, or
+    # None when the campaign is finished
     logging.info(f"Processing campaign: {campaign}")
-    df = load_campaign_data(campaign)
-
-    batch_num, batch_df = get_next_batch(df, campaign)
+    # Reads only the rows of the next batch, not the whole campaign
+    batch_num, batch_df = get_next_batch(None, campaign)
     if batch_df is None:
         logging.info(f"✅ All emails already sent for '{campaign}'.")
-        continue
-
-    sent_emails = set()
-    for _, row in batch_df.iterrows():
-        email = row.get("email")
-        name = row.get("name", "there")
-        subject = f"Follow-up from GhostBot ({datetime.today().strftime('%Y-%m-%d')})"
-        body = f"Hi {name}, just checking in as promised.<br><br>— GhostBot"
-        result = send_email(creds, email, subject, body, campaign)
-        if result.get("status") == "success":
-            sent_emails.add(email)
-            logging.info(f"✅ Sent to {email}")
-        else:
-            logging.warning(f"❌ Failed to send to {email}: {result.get('error')}")
-        time.sleep(2)
+        return None
+    return send_batch_rows(engine, campaign, batch_num, batch_df)
+
+
+def send_batch_rows(engine, campaign, batch_num, batch_df):
+    # Suppressed addresses are settled for this batch without being sent
+    suppressed = get_suppression_list()
+    suppressed.refresh()
+    batch_df, suppressed_df = suppressed.filter_frame(batch_df)
+    if not suppressed_df.empty:
+        logging.info(f"🚫 Skipping {len(suppressed_df)} suppressed address(es) in '{campaign}'.")
+        save_sent_batch(campaign, batch_num, set(suppressed_df["email"]))
+
+    # Addresses with control characters can't be sent; they fail and settle
+    invalid = batch_df["email"].map(invalid_address)
+    if invalid.any():
+        bad = set(batch_df["email"][invalid])
+        logging.warning(f"⚠️ Skipping {len(bad)} malformed address(es) in '{campaign}'.")
+        for email in bad:
+            log_campaign_email(campaign, email, "invalid address")
+        save_sent_batch(campaign, batch_num, bad)
+        batch_df = batch_df[~invalid]
 
-    save_sent_batch(campaign, batch_num, sent_emails)
+    # Render the batch into a spool of raw payloads (reused when resuming),
+    # so the send loop itself only does network I/O
+    # {date} is the send date even if the campaign has a "date" column
+    overrides = {"date": datetime.today().strftime('%Y-%m-%d')}
+    subjects = SUBJECT_TEMPLATE.render_frame(batch_df, overrides=overrides)
+    bodies = BODY_TEMPLATE.render_frame(batch_df, overrides=overrides)
+    build_spool(campaign, batch_num, list(zip(batch_df["email"], subjects, bodies)))
+    report = engine.send_batch(campaign, iter_spool(campaign, batch_num))
+
+    # Failed addresses are settled too: the ledger never retries them, so
+    # leaving them open would stall the batch forever
+    settled = report["sent_emails"] | report["failed_emails"] | report["suppressed_emails"]
+    save_sent_batch(campaign, batch_num, settled)
+    if settled.issuperset(batch_df["email"]):
+        remove_spool(campaign, batch_num)
     logging.info(f"📤 Batch {batch_num} for '{campaign}' complete.")
+    return report
+
+
+def make_engine(client, shared=False):
+    limiter = RateLimiter("gmail_send", SEND_PER_SECOND, SEND_PER_DAY, shared=shared)
+    return SendEngine(client, max_workers=SEND_WORKERS, limiter=limiter)
+
+
+def sync_reply_cancellations(client):
+    # Replies are synced before follow-ups go out, so anyone who has
+    # answered since scheduling is dropped from the queue
+    try:
+        sync_replies(client)
+    except Exception as e:
+        logging.warning(f"Reply sync failed, sending due follow-ups anyway: {e}")
+
+
+def send_due_follow_ups(engine):
+    # Only one process works the follow-up queue at a time; run_due returns
+    # at once for the others. False if follow-ups used up the daily quota.
+    if get_scheduler().run_due(engine)["deferred"]:
+        logging.warning("⏸️ Daily send quota reached by follow-ups; campaigns wait for the next run.")
+        return False
+    return True
+
+
+# --- Single process: one batch per campaign per run ---
+def send_all():
+    # Gmail client (built once, reused for every send)
+    client = get_gmail_client()
+    engine = make_engine(client)
+
+    # Due follow-ups go first
+    sync_reply_cancellations(client)
+    if not send_due_follow_ups(engine):
+        return
+
+    # Loop through all campaigns
+    for campaign in list_campaigns():
+        report = send_next_batch(engine, campaign)
+        if report and report["quota_exhausted"]:
+            logging.warning("⏸️ Daily send quota reached; remaining campaigns wait for the next run.")
+            break
+
+
+# --- Sharded: leased batches until nothing is left ---
+def run_shard(follow=False):
+    # Any number of shards (processes or hosts sharing logs/ and campaigns/)
+    # can run at once. Each claims one leased batch at a time, fairly across
+    # campaigns, and all of them draw on one SEND_PER_SECOND / SEND_PER_DAY
+    # budget. Campaigns are re-listed before every claim, so new uploads
+    # are picked up; with follow=True the shard keeps polling when idle.
+    client = get_gmail_client()
+    leases = BatchLeases()
+    sync_reply_cancellations(client)
+    while True:
+        # A fresh engine per batch: stopping one (lost lease) must not stop the next
+        engine = make_engine(client, shared=True)
+        if not send_due_follow_ups(engine):
+            return
+        claim = leases.claim(list_campaigns())
+        if claim is None:
+            if not follow:
+                logging.info("✅ No unleased batches left.")
+                return
+            time.sleep(SHARD_POLL_INTERVAL)
+            continue
+        campaign, batch_num, batch_df = claim
+        logging.info(f"Processing campaign: {campaign} (batch {batch_num}, leased by {leases.owner})")
+        with leases.hold(campaign, batch_num, on_lost=engine.stop):
+            report = send_batch_rows(engine, campaign, batch_num, batch_df)
+        if report["quota_exhausted"]:
+            logging.warning("⏸️ Daily send quota reached; this shard stops until the next run.")
+            return
+
+
+def run_pool(processes, follow=False):
+    # Starts `processes` local shards and waits for them; for several hosts,
+    # run `worker.py --shard` (or --pool) on each
+    args = [sys.executable, os.path.abspath(__file__), "--shard"] + (["--follow"] if follow else [])
+    shards = [subprocess.Popen(args) for _ in range(processes)]
+    try:
+        for shard in shards:
+            shard.wait()
+    except KeyboardInterrupt:
+        for shard in shards:
+            shard.terminate()
+        for shard in shards:
+            shard.wait()
+    failed = [s.pid for s in shards if s.returncode]
+    if failed:
+        logging.error(f"Shard process(es) {failed} exited with errors; their leases expire after {LEASE_TTL:.0f}s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send the next campaign batches.")
+    parser.add_argument("--shard", action="store_true", help="claim leased batches until none are left")
+    parser.add_argument("--pool", type=int, metavar="N", help="run N shard processes")
+    parser.add_argument("--follow", action="store_true", help="with --shard/--pool, keep polling for new batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.pool:
+        run_pool(args.pool, args.follow)
+        return
+    # Timing summary every METRICS_INTERVAL seconds and once at exit;
+    # `kill -USR2 <pid>` toggles the sampling profiler
+    reporter = metrics.start_reporter(METRICS_INTERVAL)
+    metrics.install_profiler_signal()
+    try:
+        if args.shard:
+            run_shard(args.follow)
+        else:
+            send_all()
+    finally:
+        reporter.set()
+        lines = metrics.summary()
+        if lines:
+            logging.info("📊 Metrics:\n  " + "\n  ".join(lines))
+
+
+if __name__ == "__main__":
+    main()